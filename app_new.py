@@ -1,6 +1,6 @@
 # app_new.py - Refactored Flask application using blueprints
 from flask import Flask
-from utils.database import init_db
+from utils.database import init_db, enable_wal, analyze_db, release_db
 from utils.auth import create_sample_data
 
 # Import blueprints
@@ -18,10 +18,18 @@ def create_app():
     app.secret_key = 'supersecretkey'
     app.config['DATABASE'] = 'internship.db'
     
+    # JSON responses are small dicts; skip sorting their keys on every dump
+    app.json.sort_keys = False
+    
     # Initialize database
     with app.app_context():
         init_db()
+        enable_wal()
         create_sample_data()
+        analyze_db()
+    
+    # Pooled connections are reused, so never let a request leak a transaction
+    app.teardown_appcontext(release_db)
     
     # Register blueprints
     app.register_blueprint(main_bp)
@@ -1,91 +1,81 @@
 # blueprints/admin.py - Admin blueprint
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
-from utils.database import get_db
+from flask import Blueprint, render_template, request, jsonify
+from utils.auth import require_role
+from utils.database import get_db, write_transaction
+from utils.cache import anon_page_cache
+from utils.recommendations import invalidate_recommendations
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
-def require_admin_auth():
-    """Decorator to require admin authentication."""
-    if 'user_id' not in session or session['role'] != 'admin':
-        flash('Please log in as an admin', 'danger')
-        return redirect(url_for('auth.login'))
-    return None
+PAGE_SIZE = 50
 
 @admin_bp.route('/dashboard')
+@require_role('admin')
 def dashboard():
     """Admin dashboard."""
-    auth_check = require_admin_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
     
-    # Get all users
-    irs.execute("SELECT * FROM users")
+    user_page = max(request.args.get('user_page', 0, type=int), 0)
+    intl_page = max(request.args.get('intl_page', 0, type=int), 0)
+    
+    # Get one page of users
+    irs.execute("SELECT id, name, email, role, created_at FROM users ORDER BY id LIMIT ? OFFSET ?",
+                (PAGE_SIZE, user_page * PAGE_SIZE))
     users = irs.fetchall()
     
-    # Get all internships
-    irs.execute("SELECT * FROM internships")
+    # Get one page of internships with their company name
+    irs.execute('''
+        SELECT internships.id, internships.title, internships.posted_at, users.name as company_name
+        FROM internships
+        LEFT JOIN users ON internships.company_id = users.id
+        ORDER BY internships.id LIMIT ? OFFSET ?
+    ''', (PAGE_SIZE, intl_page * PAGE_SIZE))
     internships = irs.fetchall()
     
     # Get system stats
-    irs.execute("SELECT COUNT(*) as total_users FROM users")
-    total_users = irs.fetchone()['total_users']
-    
-    irs.execute("SELECT COUNT(*) as total_internships FROM internships")
-    total_internships = irs.fetchone()['total_internships']
-    
-    irs.execute("SELECT COUNT(*) as total_applications FROM applications")
-    total_applications = irs.fetchone()['total_applications']
+    irs.execute('''
+        SELECT (SELECT COUNT(*) FROM users) as total_users,
+               (SELECT COUNT(*) FROM internships) as total_internships,
+               (SELECT COUNT(*) FROM applications) as total_applications
+    ''')
+    stats = irs.fetchone()
     
     return render_template('admin_dashboard.html', users=users, internships=internships, 
-                           total_users=total_users, total_internships=total_internships, 
-                           total_applications=total_applications)
+                           total_users=stats['total_users'],
+                           total_internships=stats['total_internships'], 
+                           total_applications=stats['total_applications'],
+                           user_page=user_page, intl_page=intl_page, page_size=PAGE_SIZE)
 
 @admin_bp.route('/user/<int:user_id>/delete', methods=['POST'])
+@require_role('admin', api=True)
 def delete_user(user_id):
     """Delete a user."""
-    auth_check = require_admin_auth()
-    if auth_check:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     conn = get_db()
-    irs = conn.cursor()
-    
+
     try:
-        # Delete user and related data
-        irs.execute("DELETE FROM users WHERE id=?", (user_id,))
-        
-        # Also delete related profile, applications, messages
-        irs.execute("DELETE FROM profiles WHERE user_id=?", (user_id,))
-        irs.execute("DELETE FROM applications WHERE student_id=?", (user_id,))
-        irs.execute("DELETE FROM messages WHERE sender_id=? OR receiver_id=?", (user_id, user_id))
-        
-        # If company, delete their internships
-        irs.execute("DELETE FROM internships WHERE company_id=?", (user_id,))
-        
-        conn.commit()
+        # Profile, CV, applications, messages and (for companies) internships
+        # are removed by the cascade trigger in init_db
+        with write_transaction(conn):
+            conn.execute("DELETE FROM users WHERE id=?", (user_id,))
+        anon_page_cache.clear()
+        invalidate_recommendations()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @admin_bp.route('/internship/<int:internship_id>/delete', methods=['POST'])
+@require_role('admin', api=True)
 def delete_internship(internship_id):
     """Delete an internship."""
-    auth_check = require_admin_auth()
-    if auth_check:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     conn = get_db()
-    irs = conn.cursor()
-    
+
     try:
-        # Delete internship and related applications/messages
-        irs.execute("DELETE FROM internships WHERE id=?", (internship_id,))
-        irs.execute("DELETE FROM applications WHERE internship_id=?", (internship_id,))
-        irs.execute("DELETE FROM messages WHERE internship_id=?", (internship_id,))
-        conn.commit()
+        # Related applications/messages are removed by the cascade trigger
+        with write_transaction(conn):
+            conn.execute("DELETE FROM internships WHERE id=?", (internship_id,))
+        anon_page_cache.clear()
+        invalidate_recommendations()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -1,11 +1,20 @@
 # blueprints/auth.py - Authentication blueprint
+import re
 import sqlite3
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from utils.database import get_db
+from utils.database import get_db, write_transaction
 from utils.auth import hash_password, check_password
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+# SQL text is kept constant so the connection's statement cache can reuse it
+SQL_USER_ID_BY_EMAIL = "SELECT id FROM users WHERE email=?"
+SQL_USER_BY_EMAIL = "SELECT id, email, password, role, name FROM users WHERE email=?"
+SQL_CV_EXISTS = "SELECT 1 FROM cvs WHERE user_id=? LIMIT 1"
+
+# local@domain.tld with no whitespace or extra '@'
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+\Z')
+
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     """Handle user registration."""
@@ -22,7 +31,7 @@ def register():
         # Validate email
         if not email:
             errors.append('Email is required.')
-        elif '@' not in email or '.' not in email.split('@')[1]:
+        elif not _EMAIL_RE.match(email):
             errors.append('Please enter a valid email address.')
         elif len(email) > 255:
             errors.append('Email is too long (max 255 characters).')
@@ -58,7 +67,7 @@ def register():
             try:
                 conn = get_db()
                 irs = conn.cursor()
-                irs.execute("SELECT id FROM users WHERE email=?", (email,))
+                irs.execute(SQL_USER_ID_BY_EMAIL, (email,))
                 existing_user = irs.fetchone()
                 if existing_user:
                     errors.append('Email is already registered. Please use a different email or login.')
@@ -77,15 +86,14 @@ def register():
         try:
             conn = get_db()
             irs = conn.cursor()
-            irs.execute("INSERT INTO users (email, password, role, name) VALUES (?, ?, ?, ?)",
-                           (email, hashed_pw, role, name))
-            conn.commit()
-            
-            # If student, create empty profile
-            if role == 'student':
-                user_id = irs.lastrowid
-                irs.execute("INSERT INTO profiles (user_id) VALUES (?)", (user_id,))
-                conn.commit()
+            with write_transaction(conn):
+                irs.execute("INSERT INTO users (email, password, role, name) VALUES (?, ?, ?, ?)",
+                               (email, hashed_pw, role, name))
+                
+                # If student, create empty profile
+                if role == 'student':
+                    user_id = irs.lastrowid
+                    irs.execute("INSERT INTO profiles (user_id) VALUES (?)", (user_id,))
             
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('auth.login'))
@@ -108,7 +116,7 @@ def login():
         
         if not email:
             errors.append('Email is required.')
-        elif '@' not in email or '.' not in email.split('@')[1]:
+        elif not _EMAIL_RE.match(email):
             errors.append('Please enter a valid email address.')
         
         if not password:
@@ -123,10 +131,11 @@ def login():
         try:
             conn = get_db()
             irs = conn.cursor()
-            irs.execute("SELECT * FROM users WHERE email=?", (email,))
+            irs.execute(SQL_USER_BY_EMAIL, (email,))
             user = irs.fetchone()
             
-            if user and check_password(password, user['password']):
+            # Always run the hash check so unknown emails take as long as known ones
+            if check_password(password, user['password'] if user else None):
                 session['user_id'] = user['id']
                 session['email'] = user['email']
                 session['role'] = user['role']
@@ -134,10 +143,9 @@ def login():
                 
                 if user['role'] == 'student':
                     # Check if student has CV
-                    irs.execute("SELECT * FROM cvs WHERE user_id=?", (user['id'],))
-                    cv = irs.fetchone()
+                    irs.execute(SQL_CV_EXISTS, (user['id'],))
                     
-                    if not cv:
+                    if irs.fetchone() is None:
                         # No CV exists, redirect to CV creation
                         return redirect(url_for('cv.create'))
                     
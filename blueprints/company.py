@@ -1,69 +1,64 @@
 # blueprints/company.py - Company blueprint
+from collections import defaultdict
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
-from utils.database import get_db
+from utils.auth import require_role
+from utils.database import get_db, write_transaction
+from utils.cache import anon_page_cache
+from utils.recommendations import invalidate_recommendations
 
 company_bp = Blueprint('company', __name__, url_prefix='/company')
 
-def require_company_auth():
-    """Decorator to require company authentication."""
-    if 'user_id' not in session or session['role'] != 'company':
-        flash('Please log in as a company', 'danger')
-        return redirect(url_for('auth.login'))
-    return None
+MESSAGES_PER_PAGE = 50
 
 @company_bp.route('/dashboard')
+@require_role('company')
 def dashboard():
     """Company dashboard."""
-    auth_check = require_company_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
     
     # Get company's internships
-    irs.execute("SELECT * FROM internships WHERE company_id=?", (session['user_id'],))
-    internships_rows = irs.fetchall()
-    
-    # Convert Row objects to dictionaries
-    internships = [dict(row) for row in internships_rows]
-    
-    # Get applications for each internship
-    applications = {}
-    for internship in internships:
+    irs.execute('''
+        SELECT id, title, description, required_skills, posted_at
+        FROM internships WHERE company_id=?
+    ''', (session['user_id'],))
+    internships = irs.fetchall()
+
+    # Get applications for all internships in one query, grouped by internship
+    applications = defaultdict(list)
+    ids = [internship['id'] for internship in internships]
+    if ids:
         irs.execute('''
-            SELECT applications.*, users.name as student_name 
-            FROM applications 
-            JOIN users ON applications.student_id = users.id 
-            WHERE internship_id=?
-        ''', (internship['id'],))
-        app_rows = irs.fetchall()
-        # Convert Row objects to dictionaries
-        applications[internship['id']] = [dict(row) for row in app_rows]
-    
-    # Get messages
+            SELECT applications.id, applications.student_id, applications.internship_id,
+                   applications.status, applications.applied_at, users.name as student_name
+            FROM applications
+            JOIN users ON applications.student_id = users.id
+            WHERE applications.internship_id IN ({})
+        '''.format(','.join('?' * len(ids))), ids)
+        # Applications go through |tojson in the template, so these stay dicts
+        for row in irs.fetchall():
+            applications[row['internship_id']].append(dict(row))
+    
+    # Get the most recent page of sent messages
+    msg_page = max(request.args.get('msg_page', 0, type=int), 0)
     irs.execute('''
         SELECT messages.content, messages.sent_at, users.name as receiver_name, internships.title
         FROM messages
         JOIN users ON messages.receiver_id = users.id
         JOIN internships ON messages.internship_id = internships.id
         WHERE messages.sender_id=?
-    ''', (session['user_id'],))
-    messages_rows = irs.fetchall()
-    
-    # Convert Row objects to dictionaries
-    messages = [dict(row) for row in messages_rows]
+        ORDER BY messages.sent_at DESC
+        LIMIT ? OFFSET ?
+    ''', (session['user_id'], MESSAGES_PER_PAGE, msg_page * MESSAGES_PER_PAGE))
+    messages = irs.fetchall()
     
     return render_template('company_dashboard.html', internships=internships, 
                            applications=applications, messages=messages)
 
 @company_bp.route('/internship/post', methods=['GET', 'POST'])
+@require_role('company')
 def post_internship():
     """Post a new internship."""
-    auth_check = require_company_auth()
-    if auth_check:
-        return auth_check
-    
     if request.method == 'POST':
         title = request.form['title']
         description = request.form['description']
@@ -79,6 +74,8 @@ def post_internship():
             irs.execute("INSERT INTO internships (company_id, title, description, required_skills) VALUES (?, ?, ?, ?)",
                            (session['user_id'], title, description, required_skills))
             conn.commit()
+            anon_page_cache.clear()
+            invalidate_recommendations()
             flash('Internship posted successfully!', 'success')
             return redirect(url_for('company.dashboard'))
         except Exception as e:
@@ -87,12 +84,9 @@ def post_internship():
     return render_template('post_internship.html')
 
 @company_bp.route('/application/<int:application_id>/update', methods=['POST'])
+@require_role('company', api=True)
 def update_application(application_id):
     """Update application status."""
-    auth_check = require_company_auth()
-    if auth_check:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     status = request.form['status']
     
     # Validate status
@@ -103,32 +97,26 @@ def update_application(application_id):
     conn = get_db()
     irs = conn.cursor()
     
-    # Verify the application belongs to the company
-    irs.execute('''
-        SELECT internships.company_id 
-        FROM applications 
-        JOIN internships ON applications.internship_id = internships.id 
-        WHERE applications.id=?
-    ''', (application_id,))
-    app_data = irs.fetchone()
-    
-    if not app_data or app_data['company_id'] != session['user_id']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     try:
-        irs.execute("UPDATE applications SET status=? WHERE id=?", (status, application_id))
+        # Update only if the application belongs to one of the company's internships
+        irs.execute('''
+            UPDATE applications SET status=?
+            WHERE id=? AND EXISTS (
+                SELECT 1 FROM internships
+                WHERE internships.id = applications.internship_id AND internships.company_id=?
+            )
+        ''', (status, application_id, session['user_id']))
         conn.commit()
+        if irs.rowcount == 0:
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 401
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @company_bp.route('/view-cv/<int:student_id>')
+@require_role('company')
 def view_student_cv(student_id):
     """View a student's CV."""
-    auth_check = require_company_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
     
@@ -147,36 +135,25 @@ def view_student_cv(student_id):
     return render_template('cv_view.html', cv=cv, student=student, company_view=True)
 
 @company_bp.route('/internship/<int:internship_id>/delete', methods=['POST'])
+@require_role('company', api=True)
 def delete_internship(internship_id):
     """Delete an internship and all related data."""
-    auth_check = require_company_auth()
-    if auth_check:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     conn = get_db()
     irs = conn.cursor()
     
-    # Verify the internship belongs to the company
-    irs.execute("SELECT company_id, title FROM internships WHERE id=?", (internship_id,))
-    internship = irs.fetchone()
-    
-    if not internship or internship['company_id'] != session['user_id']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     try:
-        # Delete related data in the correct order (due to foreign key constraints)
-        
-        # 1. Delete messages related to this internship
-        irs.execute("DELETE FROM messages WHERE internship_id=?", (internship_id,))
-        
-        # 2. Delete applications for this internship
-        irs.execute("DELETE FROM applications WHERE internship_id=?", (internship_id,))
-        
-        # 3. Delete the internship itself
-        irs.execute("DELETE FROM internships WHERE id=?", (internship_id,))
-        
-        conn.commit()
+        # Delete only if the internship belongs to the company. Messages and
+        # applications for it are removed by the cascade trigger in init_db
+        with write_transaction(conn):
+            irs.execute("DELETE FROM internships WHERE id=? AND company_id=? RETURNING title",
+                        (internship_id, session['user_id']))
+            internship = irs.fetchone()
         
+        if not internship:
+            return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+        anon_page_cache.clear()
+        invalidate_recommendations()
+
         return jsonify({
             'success': True, 
             'message': f'Internship "{internship["title"]}" deleted successfully'
@@ -1,32 +1,37 @@
 # blueprints/cv.py - CV management blueprint
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
-from utils.database import get_db
+from utils.auth import require_role
+from utils.database import get_db, write_transaction
+from utils.recommendations import invalidate_recommendations
 from datetime import datetime
 
 cv_bp = Blueprint('cv', __name__, url_prefix='/cv')
 
-def require_student_auth():
-    """Decorator to require student authentication."""
-    if 'user_id' not in session or session['role'] != 'student':
-        flash('Please log in as a student', 'danger')
-        return redirect(url_for('auth.login'))
-    return None
+# SQL text is kept constant so the connection's statement cache can reuse it
+SQL_CV_BY_USER = '''
+    SELECT full_name, email, phone, address, linkedin_url, github_url, objective,
+           education, education_details, work_experience, projects, certifications,
+           languages, languages_details, interests, updated_at
+    FROM cvs WHERE user_id=?
+'''
+SQL_CV_EXISTS = "SELECT 1 FROM cvs WHERE user_id=? LIMIT 1"
+SQL_UPSERT_PROFILE = '''
+    INSERT INTO profiles (user_id, skills, education, experience) VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        skills=excluded.skills, education=excluded.education, experience=excluded.experience
+'''
 
 @cv_bp.route('/create', methods=['GET', 'POST'])
+@require_role('student')
 def create():
     """Create a new CV."""
-    auth_check = require_student_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
     
     # Check if CV already exists
-    irs.execute("SELECT * FROM cvs WHERE user_id=?", (session['user_id'],))
-    existing_cv = irs.fetchone()
+    irs.execute(SQL_CV_EXISTS, (session['user_id'],))
     
-    if existing_cv:
+    if irs.fetchone() is not None:
         flash('You already have a CV. You can edit it instead.', 'info')
         return redirect(url_for('cv.edit'))
     
@@ -53,24 +58,22 @@ def create():
                 flash('Full name and email are required', 'danger')
                 return redirect(url_for('cv.create'))
             
-            # Insert CV into database
-            irs.execute('''
-                INSERT INTO cvs (user_id, full_name, email, phone, address, linkedin_url, 
-                               github_url, objective, education, education_details, work_experience, projects, 
-                               certifications, languages, languages_details, interests)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (session['user_id'], full_name, email, phone, address, linkedin_url,
-                  github_url, objective, education, education_details, work_experience, projects,
-                  certifications, languages, languages_details, interests))
-            
-            # Sync skills to profile (certifications field contains skills)
-            irs.execute("SELECT * FROM profiles WHERE user_id=?", (session['user_id'],))
-            profile = irs.fetchone()
-            if profile:
-                irs.execute("UPDATE profiles SET skills=?, education=?, experience=? WHERE user_id=?", 
-                              (certifications, education, work_experience, session['user_id']))
+            with write_transaction(conn):
+                # Insert CV into database
+                irs.execute('''
+                    INSERT INTO cvs (user_id, full_name, email, phone, address, linkedin_url, 
+                                   github_url, objective, education, education_details, work_experience, projects, 
+                                   certifications, languages, languages_details, interests)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (session['user_id'], full_name, email, phone, address, linkedin_url,
+                      github_url, objective, education, education_details, work_experience, projects,
+                      certifications, languages, languages_details, interests))
+                
+                # Sync skills to profile (certifications field contains skills)
+                irs.execute(SQL_UPSERT_PROFILE,
+                            (session['user_id'], certifications, education, work_experience))
+            invalidate_recommendations(session['user_id'])
             
-            conn.commit()
             flash('CV created successfully!', 'success')
             return redirect(url_for('cv.view'))
             
@@ -80,17 +83,18 @@ def create():
     return render_template('cv_create.html')
 
 @cv_bp.route('/edit', methods=['GET', 'POST'])
+@require_role('student')
 def edit():
     """Edit existing CV."""
-    auth_check = require_student_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
     
-    # Get existing CV
-    irs.execute("SELECT * FROM cvs WHERE user_id=?", (session['user_id'],))
+    # A save only needs to know the CV exists; the full row is loaded to
+    # fill the form on GET (or after a failed save)
+    if request.method == 'POST':
+        irs.execute(SQL_CV_EXISTS, (session['user_id'],))
+    else:
+        irs.execute(SQL_CV_BY_USER, (session['user_id'],))
     cv = irs.fetchone()
     
     if not cv:
@@ -120,45 +124,43 @@ def edit():
                 flash('Full name and email are required', 'danger')
                 return redirect(url_for('cv.edit'))
             
-            # Update CV in database
-            irs.execute('''
-                UPDATE cvs SET full_name=?, email=?, phone=?, address=?, linkedin_url=?, 
-                             github_url=?, objective=?, education=?, education_details=?, work_experience=?, 
-                             projects=?, certifications=?, languages=?, languages_details=?, interests=?, 
-                             updated_at=CURRENT_TIMESTAMP
-                WHERE user_id=?
-            ''', (full_name, email, phone, address, linkedin_url, github_url,
-                  objective, education, education_details, work_experience, projects, certifications,
-                  languages, languages_details, interests, session['user_id']))
+            with write_transaction(conn):
+                # Update CV in database
+                irs.execute('''
+                    UPDATE cvs SET full_name=?, email=?, phone=?, address=?, linkedin_url=?, 
+                                 github_url=?, objective=?, education=?, education_details=?, work_experience=?, 
+                                 projects=?, certifications=?, languages=?, languages_details=?, interests=?, 
+                                 updated_at=CURRENT_TIMESTAMP
+                    WHERE user_id=?
+                ''', (full_name, email, phone, address, linkedin_url, github_url,
+                      objective, education, education_details, work_experience, projects, certifications,
+                      languages, languages_details, interests, session['user_id']))
+                
+                # Sync skills to profile (certifications field contains skills)
+                irs.execute(SQL_UPSERT_PROFILE,
+                            (session['user_id'], certifications, education, work_experience))
+            invalidate_recommendations(session['user_id'])
             
-            # Sync skills to profile (certifications field contains skills)
-            irs.execute("SELECT * FROM profiles WHERE user_id=?", (session['user_id'],))
-            profile = irs.fetchone()
-            if profile:
-                irs.execute("UPDATE profiles SET skills=?, education=?, experience=? WHERE user_id=?", 
-                              (certifications, education, work_experience, session['user_id']))
-            
-            conn.commit()
             flash('CV updated successfully!', 'success')
             return redirect(url_for('cv.view'))
             
         except Exception as e:
             flash(f'Error updating CV: {str(e)}', 'danger')
+        
+        irs.execute(SQL_CV_BY_USER, (session['user_id'],))
+        cv = irs.fetchone()
     
     return render_template('cv_edit.html', cv=cv)
 
 @cv_bp.route('/view')
+@require_role('student')
 def view():
     """View CV."""
-    auth_check = require_student_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
     
     # Get CV
-    irs.execute("SELECT * FROM cvs WHERE user_id=?", (session['user_id'],))
+    irs.execute(SQL_CV_BY_USER, (session['user_id'],))
     cv = irs.fetchone()
     
     if not cv:
@@ -168,22 +170,16 @@ def view():
     return render_template('cv_view.html', cv=cv)
 
 @cv_bp.route('/download')
+@require_role('student')
 def download():
     """Download CV as PDF (placeholder for future implementation)."""
-    auth_check = require_student_auth()
-    if auth_check:
-        return auth_check
-    
     flash('PDF download feature coming soon!', 'info')
     return redirect(url_for('cv.view'))
 
 @cv_bp.route('/delete', methods=['POST'])
+@require_role('student')
 def delete():
     """Delete CV."""
-    auth_check = require_student_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
     
@@ -1,42 +1,85 @@
 # blueprints/main.py - Main blueprint for general routes
-from flask import Blueprint, render_template, request, session
+import re
+from flask import Blueprint, render_template, request, session, current_app
 from utils.database import get_db
+from utils.cache import anon_page_cache
 
 main_bp = Blueprint('main', __name__)
 
+# SQL text is kept constant so the connection's statement cache can reuse it
+# has_applied is computed per row for the student id bound to the first
+# parameter (NULL for visitors, so it is always false)
+SQL_INTERNSHIPS = '''
+    SELECT internships.*, users.name as company_name,
+           EXISTS(SELECT 1 FROM applications
+                  WHERE applications.internship_id = internships.id
+                    AND applications.student_id = ?) AS has_applied
+    FROM internships 
+    JOIN users ON internships.company_id = users.id
+'''
+SQL_INTERNSHIPS_SEARCH = '''
+    SELECT internships.*, users.name as company_name,
+           EXISTS(SELECT 1 FROM applications
+                  WHERE applications.internship_id = internships.id
+                    AND applications.student_id = ?) AS has_applied
+    FROM internships_fts
+    JOIN internships ON internships.id = internships_fts.rowid
+    JOIN users ON internships.company_id = users.id
+    WHERE internships_fts MATCH ?
+    ORDER BY internships_fts.rank
+'''
+
+# Same word characters as FTS5's default unicode61 tokenizer
+_SEARCH_TOKEN_RE = re.compile(r'[^\W_]+')
+
+def build_fts_query(search):
+    """Turn free-text search input into an FTS5 prefix query ('' if no terms)."""
+    return ' '.join(f'"{token}"*' for token in _SEARCH_TOKEN_RE.findall(search))
+
+def _cached_for_anonymous(name, timeout, render):
+    """Serve a rendered page from anon_page_cache when the session is empty."""
+    if session:
+        # Logged in or has pending flash messages, so the page is personal
+        return render()
+    key = (current_app.config['DATABASE'], name)
+    page = anon_page_cache.get(key)
+    if page is None:
+        page = render()
+        anon_page_cache.set(key, page, timeout)
+    return page
+
 @main_bp.route('/')
 def home():
     """Home page."""
-    return render_template('index.html')
+    return _cached_for_anonymous('home', 300, lambda: render_template('index.html'))
 
 @main_bp.route('/internships')
 def internships():
     """Browse all internships."""
+    search = request.args.get('search', '')
+    if not search:
+        return _cached_for_anonymous('internships', 30, lambda: _render_internships(search))
+    return _render_internships(search)
+
+def _render_internships(search):
+    """Query and render the internship listing (optionally filtered by search)."""
     conn = get_db()
     irs = conn.cursor()
     
-    search = request.args.get('search', '')
+    student_id = None
+    if 'user_id' in session and session['role'] == 'student':
+        student_id = session['user_id']
+    
     if search:
-        irs.execute('''
-            SELECT internships.*, users.name as company_name 
-            FROM internships 
-            JOIN users ON internships.company_id = users.id 
-            WHERE internships.title LIKE ? OR internships.description LIKE ?
-        ''', (f'%{search}%', f'%{search}%'))
+        fts_query = build_fts_query(search)
+        if fts_query:
+            irs.execute(SQL_INTERNSHIPS_SEARCH, (student_id, fts_query))
+            internships = irs.fetchall()
+        else:
+            # Nothing searchable (e.g. only punctuation)
+            internships = []
     else:
-        irs.execute('''
-            SELECT internships.*, users.name as company_name 
-            FROM internships 
-            JOIN users ON internships.company_id = users.id
-        ''')
-    
-    internships = irs.fetchall()
-    
-    # Check if user has applied to each internship
-    applied_internships = []
-    if 'user_id' in session and session['role'] == 'student':
-        irs.execute("SELECT internship_id FROM applications WHERE student_id=?", (session['user_id'],))
-        applied_internships = [row['internship_id'] for row in irs.fetchall()]
+        irs.execute(SQL_INTERNSHIPS, (student_id,))
+        internships = irs.fetchall()
     
-    return render_template('internships.html', internships=internships, 
-                           applied_internships=applied_internships, search=search)
+    return render_template('internships.html', internships=internships, search=search)
@@ -1,5 +1,6 @@
 # blueprints/messaging.py - Messaging blueprint
 from flask import Blueprint, request, session, jsonify
+from utils.database import get_db
 
 messaging_bp = Blueprint('messaging', __name__, url_prefix='/message')
 
@@ -9,14 +10,16 @@ def send_message():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Unauthorized'}), 401
     
-    receiver_id = request.form['receiver_id']
-    internship_id = request.form['internship_id']
+    try:
+        receiver_id = int(request.form['receiver_id'])
+        internship_id = int(request.form['internship_id'])
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid receiver or internship'}), 400
     content = request.form['content']
     
     if not content:
         return jsonify({'success': False, 'message': 'Message content is required'}), 400
     
-    from utils.database import get_db
     conn = get_db()
     irs = conn.cursor()
     
@@ -1,103 +1,107 @@
 # blueprints/student.py - Student blueprint
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from utils.database import get_db
-from utils.recommendations import get_recommendations
-from datetime import datetime
+from utils.auth import require_role
+from utils.database import get_db, read_transaction
+from utils.recommendations import get_recommendations, invalidate_recommendations, record_application
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
 
-def require_student_auth():
-    """Decorator to require student authentication."""
-    if 'user_id' not in session or session['role'] != 'student':
-        flash('Please log in as a student', 'danger')
-        return redirect(url_for('auth.login'))
-    return None
+# SQL text is kept constant so the connection's statement cache can reuse it
+SQL_DASH_PROFILE = '''
+    SELECT profiles.id as profile_id, profiles.skills, profiles.education, profiles.experience,
+           cvs.id as cv_id, cvs.certifications, cvs.education as cv_education,
+           cvs.work_experience, cvs.updated_at as "updated_at [timestamp]"
+    FROM users
+    LEFT JOIN profiles ON profiles.user_id = users.id
+    LEFT JOIN cvs ON cvs.user_id = users.id
+    WHERE users.id=?
+    LIMIT 1
+'''
+SQL_DASH_APPLICATIONS = '''
+    SELECT internships.title, applications.status, applications.applied_at 
+    FROM applications 
+    JOIN internships ON applications.internship_id = internships.id 
+    WHERE student_id=?
+'''
+SQL_DASH_MESSAGES = '''
+    SELECT messages.content, messages.sent_at, users.name as sender_name, internships.title
+    FROM messages
+    JOIN users ON messages.sender_id = users.id
+    JOIN internships ON messages.internship_id = internships.id
+    WHERE messages.receiver_id=?
+'''
+SQL_PROFILE_CV = '''
+    SELECT certifications, education, work_experience, updated_at as "updated_at [timestamp]"
+    FROM cvs WHERE user_id=?
+'''
+SQL_PROFILE = "SELECT skills, education, experience FROM profiles WHERE user_id=?"
+SQL_CV_EXISTS = "SELECT 1 FROM cvs WHERE user_id=? LIMIT 1"
+SQL_UPDATE_PROFILE = "UPDATE profiles SET skills=?, education=?, experience=? WHERE user_id=?"
+SQL_APPLY = "INSERT OR IGNORE INTO applications (student_id, internship_id) VALUES (?, ?)"
 
 @student_bp.route('/dashboard')
+@require_role('student')
 def dashboard():
     """Student dashboard."""
-    auth_check = require_student_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
+    user_id = session['user_id']
     
-    # Get student profile
-    irs.execute("SELECT * FROM profiles WHERE user_id=?", (session['user_id'],))
-    profile = irs.fetchone()
+    # Read profile/CV, applications and messages from one snapshot
+    with read_transaction(conn):
+        # Get student profile and CV in one query (either may be missing)
+        irs.execute(SQL_DASH_PROFILE, (user_id,))
+        row = irs.fetchone()
+        
+        # Get applications
+        irs.execute(SQL_DASH_APPLICATIONS, (user_id,))
+        applications = irs.fetchall()
+        
+        # Get messages
+        irs.execute(SQL_DASH_MESSAGES, (user_id,))
+        messages = irs.fetchall()
     
-    # Get student CV
-    irs.execute("SELECT * FROM cvs WHERE user_id=?", (session['user_id'],))
-    cv_row = irs.fetchone()
+    profile = None
+    if row and row['profile_id'] is not None:
+        profile = {'skills': row['skills'], 'education': row['education'],
+                   'experience': row['experience']}
     
-    # Convert sqlite3.Row to dict and handle datetime conversion
+    # Build the CV dict (updated_at is parsed to a datetime by the
+    # [timestamp] column converter, or None if it can't be parsed)
     cv = None
-    if cv_row:
-        cv = dict(cv_row)
-        # Convert string timestamps to datetime objects if CV exists
-        if cv['updated_at']:
-            try:
-                # Handle both string and datetime formats
-                if isinstance(cv['updated_at'], str):
-                    cv['updated_at'] = datetime.strptime(cv['updated_at'], '%Y-%m-%d %H:%M:%S')
-            except (ValueError, TypeError):
-                # If parsing fails, set to None
-                cv['updated_at'] = None
+    if row and row['cv_id'] is not None:
+        cv = {'certifications': row['certifications'], 'education': row['cv_education'],
+              'work_experience': row['work_experience'], 'updated_at': row['updated_at']}
     
     # Note: Skills are now managed through CV creation
     
-    # Get applications
-    irs.execute('''
-        SELECT internships.title, applications.status, applications.applied_at 
-        FROM applications 
-        JOIN internships ON applications.internship_id = internships.id 
-        WHERE student_id=?
-    ''', (session['user_id'],))
-    applications = irs.fetchall()
-    
-    # Get recommended internships
-    recommendations = get_recommendations(session['user_id'])
-    
-    # Get messages
-    irs.execute('''
-        SELECT messages.content, messages.sent_at, users.name as sender_name, internships.title
-        FROM messages
-        JOIN users ON messages.sender_id = users.id
-        JOIN internships ON messages.internship_id = internships.id
-        WHERE messages.receiver_id=?
-    ''', (session['user_id'],))
-    messages = irs.fetchall()
+    # Get recommended internships (may write to recommendations_cache, so
+    # it runs after the read transaction)
+    recommendations = get_recommendations(user_id)
     
     return render_template('student_dashboard.html', profile=profile, cv=cv, applications=applications, 
                            recommendations=recommendations, messages=messages)
 
 
 @student_bp.route('/profile', methods=['GET', 'POST'])
+@require_role('student')
 def profile():
     """Student profile management."""
-    auth_check = require_student_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
     
-    # Get student CV
-    irs.execute("SELECT * FROM cvs WHERE user_id=?", (session['user_id'],))
-    cv = irs.fetchone()
-    
     if request.method == 'POST':
         # Only allow manual profile updates if no CV exists
-        if not cv:
+        irs.execute(SQL_CV_EXISTS, (session['user_id'],))
+        if not irs.fetchone():
             skills = request.form['skills']
             education = request.form['education']
             experience = request.form['experience']
             
             try:
-                irs.execute("UPDATE profiles SET skills=?, education=?, experience=? WHERE user_id=?", 
-                               (skills, education, experience, session['user_id']))
+                irs.execute(SQL_UPDATE_PROFILE, (skills, education, experience, session['user_id']))
                 conn.commit()
+                invalidate_recommendations(session['user_id'])
                 flash('Profile updated successfully!', 'success')
             except Exception as e:
                 flash(f'Error updating profile: {str(e)}', 'danger')
@@ -106,32 +110,32 @@ def profile():
         
         return redirect(url_for('student.profile'))
     
-    irs.execute("SELECT * FROM profiles WHERE user_id=?", (session['user_id'],))
+    # Get student CV
+    irs.execute(SQL_PROFILE_CV, (session['user_id'],))
+    cv = irs.fetchone()
+    
+    irs.execute(SQL_PROFILE, (session['user_id'],))
     profile = irs.fetchone()
     return render_template('student_profile.html', profile=profile, cv=cv)
 
 @student_bp.route('/apply/<int:internship_id>', methods=['POST'])
+@require_role('student')
 def apply_internship(internship_id):
     """Apply to an internship."""
-    auth_check = require_student_auth()
-    if auth_check:
-        return auth_check
-    
     conn = get_db()
     irs = conn.cursor()
     
-    # Check if already applied
-    irs.execute("SELECT * FROM applications WHERE student_id=? AND internship_id=?", 
-                   (session['user_id'], internship_id))
-    if irs.fetchone():
-        flash('You have already applied to this internship', 'warning')
-        return redirect(url_for('main.internships'))
-    
     try:
-        irs.execute("INSERT INTO applications (student_id, internship_id) VALUES (?, ?)", 
-                       (session['user_id'], internship_id))
+        # The unique (student_id, internship_id) index turns a repeat
+        # application into a no-op, even for concurrent requests
+        irs.execute(SQL_APPLY, (session['user_id'], internship_id))
         conn.commit()
-        flash('Application submitted successfully!', 'success')
+        if irs.rowcount == 0:
+            flash('You have already applied to this internship', 'warning')
+        else:
+            record_application(session['user_id'], internship_id)
+            invalidate_recommendations(session['user_id'])
+            flash('Application submitted successfully!', 'success')
     except Exception as e:
         flash(f'Error applying: {str(e)}', 'danger')
     
@@ -3,21 +3,15 @@
 Example script demonstrating how to use the offline evaluation system.
 """
 
-from offline_evaluation import (
-    run_comprehensive_evaluation,
-    calculate_precision_at_k,
-    calculate_recall_at_k,
-    calculate_ndcg,
-    ABTest,
-    validate_content_based_algorithm,
-    validate_collaborative_filtering_algorithm,
-    validate_hybrid_algorithm
-)
 import sqlite3
-import json
+
+# Each example imports what it needs from offline_evaluation, so running
+# one example doesn't load the whole evaluation stack
 
 def example_basic_metrics():
     """Example: Calculate basic metrics manually."""
+    from offline_evaluation import calculate_precision_at_k, calculate_recall_at_k, calculate_ndcg
+    
     print("="*80)
     print("EXAMPLE: Basic Metrics Calculation")
     print("="*80)
@@ -42,6 +36,12 @@ def example_basic_metrics():
 
 def example_validation(db_path="internship.db"):
     """Example: Validate algorithms before evaluation."""
+    from offline_evaluation import (
+        validate_content_based_algorithm,
+        validate_collaborative_filtering_algorithm,
+        validate_hybrid_algorithm
+    )
+    
     print("="*80)
     print("EXAMPLE: Algorithm Validation")
     print("="*80)
@@ -68,7 +68,7 @@ def example_validation(db_path="internship.db"):
         
         # Validate Hybrid
         print("\n3. Hybrid Algorithm Validation:")
-        hybrid_val = validate_hybrid_algorithm(conn)
+        hybrid_val = validate_hybrid_algorithm(conn, content_val, collab_val)
         print(f"   Hybrid ready: {'✓' if hybrid_val['hybrid_ready'] else '✗'}")
         
         conn.close()
@@ -83,6 +83,8 @@ def example_validation(db_path="internship.db"):
 
 def example_comprehensive_evaluation(db_path="internship.db"):
     """Example: Run comprehensive evaluation."""
+    from offline_evaluation import run_comprehensive_evaluation
+    
     print("="*80)
     print("EXAMPLE: Comprehensive Evaluation")
     print("="*80)
@@ -112,6 +114,8 @@ def example_comprehensive_evaluation(db_path="internship.db"):
 
 def example_ab_testing(db_path="internship.db"):
     """Example: Run A/B testing."""
+    from offline_evaluation import ABTest, to_json
+    
     print("="*80)
     print("EXAMPLE: A/B Testing")
     print("="*80)
@@ -145,7 +149,7 @@ def example_ab_testing(db_path="internship.db"):
         
         # Print results
         print("\nA/B Test Results:")
-        print(json.dumps(results, indent=2))
+        print(to_json(results))
         
         conn.close()
         print()
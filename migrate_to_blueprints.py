@@ -14,7 +14,7 @@ def backup_original_app():
     backup_name = f"app_original_backup_{timestamp}.py"
     
     if os.path.exists("app.py"):
-        shutil.copy2("app.py", backup_name)
+        shutil.copyfile("app.py", backup_name)
         print(f"✅ Backed up original app.py to {backup_name}")
         return True
     else:
@@ -24,7 +24,10 @@ def backup_original_app():
 def replace_app():
     """Replace app.py with the new blueprint version"""
     if os.path.exists("app_new.py"):
-        shutil.copy2("app_new.py", "app.py")
+        # Copy next to app.py, then swap it in atomically so app.py is
+        # never left half-written
+        shutil.copyfile("app_new.py", "app.py.tmp")
+        os.replace("app.py.tmp", "app.py")
         print("✅ Replaced app.py with blueprint version")
         return True
     else:
@@ -18,25 +18,97 @@ Online Evaluation Support:
 
 import sqlite3
 import math
-import json
+import heapq
 import os
 from typing import List, Dict, Set, Tuple, Optional
 from datetime import datetime
 from collections import defaultdict
+from collections.abc import Mapping
+from itertools import accumulate, chain, islice
+from operator import itemgetter
 import sys
 
-# Add utils to path for imports
+try:
+    import orjson  # Optional: much faster JSON encoding for large reports
+except ImportError:
+    orjson = None
+
+# Add utils to path for imports (utils.recommendations pulls in Flask, so
+# it is imported where the content-based and hybrid evaluations need it,
+# not here, keeping the metrics and collaborative workers free of it)
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from utils.recommendations import (
-    content_based_recommendations,
-    collaborative_filtering
-)
 
 
 # ============================================================================
 # CORE EVALUATION METRICS
 # ============================================================================
 
+# Below this many users a process pool costs more than it saves
+MAP_PARALLEL_MIN_USERS = 2000
+COLLAB_PARALLEL_MIN_USERS = 1000
+
+# DCG position discounts 1 / log2(i + 1) for ranks i = 1..1024
+_DCG_DISCOUNTS = tuple(1.0 / math.log2(i + 1) for i in range(1, 1025))
+
+
+def _discounts(n: int) -> Tuple[float, ...]:
+    """DCG discounts covering at least the first n ranks."""
+    if n <= len(_DCG_DISCOUNTS):
+        return _DCG_DISCOUNTS
+    return _DCG_DISCOUNTS + tuple(1.0 / math.log2(i + 1) for i in range(len(_DCG_DISCOUNTS) + 1, n + 1))
+
+
+# IDCG under binary relevance for 1..1024 relevant items: the ideal ranking
+# puts every relevant item first, so IDCG@K is a prefix sum of discounts
+_IDCG_PREFIX = tuple(accumulate(_DCG_DISCOUNTS))
+
+
+def _binary_idcg(n: int) -> float:
+    """IDCG when the top n ranks all hold relevant items."""
+    if n <= 0:
+        return 0.0
+    if n <= len(_IDCG_PREFIX):
+        return _IDCG_PREFIX[n - 1]
+    return sum(_discounts(n)[:n])
+
+
+def _as_set(relevant_list) -> Set[int]:
+    """
+    Ground truth as a set, reusing it when it already is one.
+    
+    Callers that evaluate several K values for a user build a frozenset
+    once and pass it to every metric.
+    """
+    return relevant_list if isinstance(relevant_list, (set, frozenset)) else set(relevant_list)
+
+
+def _count_hits(recommended_list: List[int], relevant_list, k: int) -> int:
+    """Count the distinct relevant items among the top-k recommendations."""
+    relevant_set = _as_set(relevant_list)
+    return len(relevant_set.intersection(islice(recommended_list, k)))
+
+
+def _hit_vector(recommended_list: List[int], relevant_set: Set[int], k: int) -> List[int]:
+    """Binary relevance (1 = relevant) of each of the top-k recommendations.
+    
+    Build it once for the largest K and slice it for smaller ones.
+    """
+    return [1 if item in relevant_set else 0 for item in islice(recommended_list, k)]
+
+
+def _first_hit_vector(recommended_list: List[int], relevant_set: Set[int], k: int) -> List[int]:
+    """_hit_vector, except a relevant item recommended again counts as a miss.
+    
+    Precision and recall count each relevant item once.
+    """
+    seen = set()
+    vector = []
+    for item in islice(recommended_list, k):
+        vector.append(1 if item in relevant_set and item not in seen else 0)
+        seen.add(item)
+    return vector
+
+
 def calculate_precision_at_k(recommended_list: List[int], relevant_list: List[int], k: int) -> float:
     """
     Calculate Precision@K - fraction of top-K recommendations that are relevant.
@@ -55,11 +127,8 @@ def calculate_precision_at_k(recommended_list: List[int], relevant_list: List[in
     if k == 0:
         return 0.0
     
-    # Take top k recommendations
-    top_k = recommended_list[:k]
-    
-    # Count how many are relevant
-    relevant_in_top_k = len(set(top_k) & set(relevant_list))
+    # Count how many of the top k recommendations are relevant
+    relevant_in_top_k = _count_hits(recommended_list, relevant_list, k)
     
     # Precision = relevant items in top-k / k
     precision = relevant_in_top_k / k if k > 0 else 0.0
@@ -88,11 +157,8 @@ def calculate_recall_at_k(recommended_list: List[int], relevant_list: List[int],
     if k == 0:
         return 0.0
     
-    # Take top k recommendations
-    top_k = recommended_list[:k]
-    
     # Count how many relevant items are in top-k
-    relevant_in_top_k = len(set(top_k) & set(relevant_list))
+    relevant_in_top_k = _count_hits(recommended_list, relevant_list, k)
     
     # Recall = relevant items in top-k / total relevant items
     recall = relevant_in_top_k / len(relevant_list) if relevant_list else 0.0
@@ -122,30 +188,42 @@ def calculate_average_precision(recommended_list: List[int], relevant_list: Set[
     if k == 0:
         return 0.0
     
-    top_k = recommended_list[:k]
-    relevant_count = 0
-    precision_sum = 0.0
+    precision_sums = _precision_sums(_hit_vector(recommended_list, relevant_list, k))
+    return _average_precision_at(precision_sums, k, len(relevant_list))
+
+
+def _precision_sums(hits: List[int]) -> List[float]:
+    """
+    Running Σ(Precision@i * rel(i)) over the ranks of a hit vector.
     
-    for i, item in enumerate(top_k, 1):
-        if item in relevant_list:
-            relevant_count += 1
-            precision_at_i = relevant_count / i
-            precision_sum += precision_at_i
+    The cumulative hit count at rank i gives Precision@i directly, so AP
+    at every K is a prefix of this list.
+    """
+    return list(accumulate(relevant_count / i if hit else 0.0
+                           for i, (hit, relevant_count) in enumerate(zip(hits, accumulate(hits)), 1)))
+
+
+def _average_precision_at(precision_sums: List[float], k: int, relevant_count_total: int) -> float:
+    """AP@k from _precision_sums of a hit vector built for some K >= k."""
+    if k <= 0 or not precision_sums:
+        return 0.0
     
     # Average Precision = sum of precisions / total relevant items
-    ap = precision_sum / len(relevant_list) if relevant_list else 0.0
-    
-    return ap
+    return precision_sums[min(k, len(precision_sums)) - 1] / relevant_count_total
 
 
-def calculate_map(recommendations: Dict[int, List[int]], ground_truth: Dict[int, List[int]], k_values: List[int] = [5, 10]) -> Dict[int, float]:
+def calculate_map(recommendations: Dict[int, List[int]], ground_truth: Dict[int, List[int]], k_values: List[int] = [5, 10],
+                  workers: Optional[int] = None) -> Dict[int, float]:
     """
     Calculate Mean Average Precision (MAP) across multiple users.
     
     Args:
         recommendations: Dictionary mapping user_id to list of recommended item IDs
-        ground_truth: Dictionary mapping user_id to list of relevant item IDs
+        ground_truth: Dictionary mapping user_id to list (or set) of relevant item IDs
         k_values: List of K values to evaluate (e.g., [5, 10, 20])
+        workers: Number of worker processes to shard users across. Only used
+            for at least MAP_PARALLEL_MIN_USERS users, where it outweighs the
+            cost of starting the processes.
     
     Returns:
         Dictionary mapping K to MAP@K score
@@ -153,58 +231,91 @@ def calculate_map(recommendations: Dict[int, List[int]], ground_truth: Dict[int,
     Formula:
         MAP@K = (1/|U|) * Σ AP@K(u) for all users u
     """
-    map_scores = {}
+    items = list(recommendations.items())
     
-    for k in k_values:
-        ap_scores = []
-        
-        # Calculate AP for each user
-        for user_id, recommended_list in recommendations.items():
-            if user_id in ground_truth:
-                relevant_list = set(ground_truth[user_id])
-                if relevant_list:  # Only calculate if user has relevant items
-                    ap = calculate_average_precision(recommended_list, relevant_list, k)
-                    ap_scores.append(ap)
+    if workers and workers > 1 and len(items) >= MAP_PARALLEL_MIN_USERS:
+        # Contiguous shards, merged in order, so the sums match a serial run
+        from concurrent.futures import ProcessPoolExecutor
         
-        # MAP = mean of all AP scores
-        map_scores[k] = sum(ap_scores) / len(ap_scores) if ap_scores else 0.0
+        size = -(-len(items) // workers)
+        shards = [items[i:i + size] for i in range(0, len(items), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shard_scores = list(pool.map(
+                _ap_scores,
+                shards,
+                [{uid: ground_truth[uid] for uid, _ in shard if uid in ground_truth} for shard in shards],
+                [k_values] * len(shards)))
+        ap_scores = {k: [ap for scores in shard_scores for ap in scores[k]] for k in k_values}
+    else:
+        ap_scores = _ap_scores(items, ground_truth, k_values)
     
-    return map_scores
+    # MAP = mean of all AP scores
+    return {k: sum(scores) / len(scores) if scores else 0.0
+            for k, scores in ap_scores.items()}
+
+
+def _ap_scores(items: List[Tuple[int, List[int]]], ground_truth: Dict[int, List[int]],
+               k_values: List[int]) -> Dict[int, List[float]]:
+    """AP@K of each (user_id, recommended_list) pair that has ground truth."""
+    ap_scores = {k: [] for k in k_values}
+    max_k = max(k_values, default=0)
+    
+    # Calculate AP for each user, matching the top-K against the ground
+    # truth once and reading every K off the same running sums
+    for user_id, recommended_list in items:
+        if user_id in ground_truth:
+            relevant_list = _as_set(ground_truth[user_id])
+            if relevant_list:  # Only calculate if user has relevant items
+                precision_sums = _precision_sums(_hit_vector(recommended_list, relevant_list, max_k))
+                for k in k_values:
+                    ap_scores[k].append(_average_precision_at(precision_sums, k, len(relevant_list)))
+    
+    return ap_scores
 
 
-def calculate_dcg(recommended_list: List[int], relevant_list: Set[int], k: int) -> float:
+def calculate_dcg(recommended_list: List[int], relevant_list, k: int) -> float:
     """
     Calculate Discounted Cumulative Gain (DCG).
     
     Args:
         recommended_list: List of recommended item IDs (sorted by relevance)
-        relevant_list: Set of relevant item IDs (ground truth)
+        relevant_list: Set of relevant item IDs (binary relevance), or a
+            mapping of item ID to graded relevance
         k: Number of top recommendations to consider
     
     Returns:
         DCG score
-    """
-    dcg = 0.0
-    top_k = recommended_list[:k]
     
-    for i, item in enumerate(top_k, 1):
-        if item in relevant_list:
-            # DCG: rel_i / log2(i + 1)
-            # Using binary relevance (1 if relevant, 0 otherwise)
-            relevance = 1.0
-            dcg += relevance / math.log2(i + 1)
-    
-    return dcg
+    Formula:
+        DCG@K = Σ (2^rel_i - 1) / log2(i + 1)
+    """
+    if isinstance(relevant_list, Mapping):
+        return _dcg_from_gains([relevant_list.get(item, 0.0) for item in islice(recommended_list, k)])
+    
+    # Binary relevance (1 if relevant, 0 otherwise): 2^1 - 1 = 1, so each
+    # hit adds just its discount
+    return sum(discount
+               for discount, item in zip(_discounts(min(k, len(recommended_list))),
+                                         islice(recommended_list, k))
+               if item in relevant_list)
+
+
+def _dcg_from_gains(relevances: List[float]) -> float:
+    """DCG of graded relevance values listed in rank order."""
+    return sum((2 ** rel - 1) * discount
+               for discount, rel in zip(_discounts(len(relevances)), relevances)
+               if rel)
 
 
-def calculate_ndcg(recommended_list: List[int], relevant_list: List[int], k: int) -> float:
+def calculate_ndcg(recommended_list: List[int], relevant_list, k: int) -> float:
     """
     Calculate Normalized Discounted Cumulative Gain (NDCG).
     Accounts for ranking position of relevant items.
     
     Args:
         recommended_list: List of recommended item IDs (sorted by relevance)
-        relevant_list: List of relevant item IDs (ground truth)
+        relevant_list: List of relevant item IDs (binary relevance), or a
+            mapping of item ID to graded relevance (e.g. a rating)
         k: Number of top recommendations to consider
     
     Returns:
@@ -220,15 +331,22 @@ def calculate_ndcg(recommended_list: List[int], relevant_list: List[int], k: int
     if k == 0:
         return 0.0
     
-    relevant_set = set(relevant_list)
+    if isinstance(relevant_list, Mapping):
+        dcg = calculate_dcg(recommended_list, relevant_list, k)
+        
+        # Ideal ranking puts the highest grades first
+        idcg = _dcg_from_gains(sorted(relevant_list.values(), reverse=True)[:k])
+        
+        return dcg / idcg if idcg > 0 else 0.0
+    
+    relevant_set = _as_set(relevant_list)
     
     # Calculate DCG for recommended list
     dcg = calculate_dcg(recommended_list, relevant_set, k)
     
-    # Calculate Ideal DCG (IDCG) - perfect ranking
-    # Sort relevant items by their ideal order (all relevant items first)
-    ideal_list = list(relevant_set)[:k]
-    idcg = calculate_dcg(ideal_list, relevant_set, k)
+    # Calculate Ideal DCG (IDCG) - perfect ranking puts all relevant
+    # items first, whichever they are
+    idcg = _binary_idcg(min(k, len(relevant_set)))
     
     # NDCG = DCG / IDCG
     ndcg = dcg / idcg if idcg > 0 else 0.0
@@ -236,10 +354,60 @@ def calculate_ndcg(recommended_list: List[int], relevant_list: List[int], k: int
     return ndcg
 
 
+def _metrics_at_k(recommended_list: List[int], relevant_set: Set[int],
+                  k_values: List[int]) -> Dict[int, Tuple[float, float, float]]:
+    """
+    (Precision@K, Recall@K, NDCG@K) for every K under binary relevance.
+    
+    Matches the top-K against the ground truth once for the largest K and
+    reads each K off running hit counts and DCG sums, instead of calling
+    the three calculate_* functions per K.
+    """
+    max_k = max(k_values, default=0)
+    hits = _hit_vector(recommended_list, relevant_set, max_k)
+    hit_counts = list(accumulate(_first_hit_vector(recommended_list, relevant_set, max_k)))
+    dcgs = list(accumulate(discount if hit else 0.0 for discount, hit in zip(_discounts(len(hits)), hits)))
+    relevant_count = len(relevant_set)
+    
+    metrics = {}
+    for k in k_values:
+        if k <= 0:
+            metrics[k] = (0.0, 0.0, 0.0)
+            continue
+        
+        n = min(k, len(hits))
+        hit_count = hit_counts[n - 1] if n else 0
+        dcg = dcgs[n - 1] if n else 0.0
+        idcg = _binary_idcg(min(k, relevant_count))
+        
+        metrics[k] = (hit_count / k,
+                      hit_count / relevant_count if relevant_count else 0.0,
+                      dcg / idcg if idcg > 0 else 0.0)
+    return metrics
+
+
 # ============================================================================
 # ALGORITHM EVALUATION FUNCTIONS
 # ============================================================================
 
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    """
+    Open the database read-only for evaluation.
+    
+    The evaluation never writes, so the connection is opened with mode=ro
+    and query_only, with a large page cache and memory-mapped reads.
+    """
+    from urllib.parse import quote
+    
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_path))}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+
 def get_ground_truth(conn: sqlite3.Connection, user_ids: Optional[List[int]] = None) -> Dict[int, List[int]]:
     """
     Get ground truth data from applications table.
@@ -251,7 +419,9 @@ def get_ground_truth(conn: sqlite3.Connection, user_ids: Optional[List[int]] = N
     Returns:
         Dictionary mapping user_id to list of applied internship IDs
     """
+    # Plain tuples: two columns unpacked by position don't need sqlite3.Row
     cursor = conn.cursor()
+    cursor.row_factory = None
     
     if user_ids:
         placeholders = ','.join('?' * len(user_ids))
@@ -260,40 +430,81 @@ def get_ground_truth(conn: sqlite3.Connection, user_ids: Optional[List[int]] = N
     else:
         cursor.execute("SELECT student_id, internship_id FROM applications")
     
-    applications = cursor.fetchall()
-    
+    # Iterate the cursor rather than fetchall() so rows are streamed
+    # instead of held in a list alongside the result
     ground_truth = defaultdict(list)
-    for app in applications:
-        user_id = app['student_id']
-        internship_id = app['internship_id']
+    for user_id, internship_id in cursor:
         ground_truth[user_id].append(internship_id)
     
     return dict(ground_truth)
 
 
+def batch_content_based_recommendations(conn: sqlite3.Connection, user_ids: List[int]) -> Dict[int, List[Dict]]:
+    """
+    Content-based recommendations for many users at once.
+    
+    Gives the same results as calling content_based_recommendations for each
+    user, but loads the internships (with company names) and parses their
+    required skills once instead of once per user.
+    
+    Returns:
+        Dictionary mapping user_id to its top-5 recommendation dicts
+    """
+    from utils.recommendations import load_internship_skills, parse_skills, score_internships
+    
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    
+    # Student skills; like the per-user query, the first profile row wins
+    cursor.execute("SELECT user_id, skills FROM profiles ORDER BY id")
+    profile_skills = {}
+    for row in cursor.fetchall():
+        profile_skills.setdefault(row['user_id'], row['skills'])
+    
+    # Every internship with its parsed skills and company name, loaded once
+    internship_skills = load_internship_skills(cursor)
+    
+    recommendations = {}
+    for user_id in user_ids:
+        skills = profile_skills.get(user_id)
+        recommendations[user_id] = score_internships(parse_skills(skills), internship_skills) if skills else []
+    
+    return recommendations
+
+
 def evaluate_content_based(
     conn: sqlite3.Connection,
     user_ids: List[int],
     ground_truth: Dict[int, List[int]],
-    k_values: List[int] = [5, 10, 20]
+    k_values: List[int] = [5, 10, 20],
+    content_recs: Optional[Dict[int, List[Dict]]] = None
 ) -> Dict[str, Dict[int, float]]:
     """
     Evaluate Content-Based Filtering algorithm.
     
+    Args:
+        content_recs: Precomputed batch_content_based_recommendations output
+            covering user_ids; computed here when omitted
+    
     Returns:
         Dictionary with metrics: {'precision': {k: score}, 'recall': {k: score}, ...}
     """
-    cursor = conn.cursor()
-    cursor.row_factory = sqlite3.Row
-    
+    # Running totals per K; every scored user contributes to each K
     results = {
-        'precision': defaultdict(list),
-        'recall': defaultdict(list),
-        'ndcg': defaultdict(list),
+        'precision': defaultdict(float),
+        'recall': defaultdict(float),
+        'ndcg': defaultdict(float),
         'map': {}
     }
+    users_scored = 0
     
     recommendations = {}
+    relevant_sets = {}
+    
+    # Score every evaluated user in one pass over the internships
+    if content_recs is None:
+        content_recs = batch_content_based_recommendations(
+            conn, [user_id for user_id in user_ids if user_id in ground_truth])
     
     for user_id in user_ids:
         if user_id not in ground_truth:
@@ -301,42 +512,90 @@ def evaluate_content_based(
         
         # Get content-based recommendations
         try:
-            recs = content_based_recommendations(user_id, cursor)
+            recs = content_recs[user_id]
             recommended_ids = [rec['id'] for rec in recs]
             recommendations[user_id] = recommended_ids
             
-            relevant_ids = ground_truth[user_id]
+            relevant_ids = relevant_sets[user_id] = frozenset(ground_truth[user_id])
             
             # Calculate metrics for each k
-            for k in k_values:
-                precision = calculate_precision_at_k(recommended_ids, relevant_ids, k)
-                recall = calculate_recall_at_k(recommended_ids, relevant_ids, k)
-                ndcg = calculate_ndcg(recommended_ids, relevant_ids, k)
-                
-                results['precision'][k].append(precision)
-                results['recall'][k].append(recall)
-                results['ndcg'][k].append(ndcg)
+            for k, (precision, recall, ndcg) in _metrics_at_k(recommended_ids, relevant_ids, k_values).items():
+                results['precision'][k] += precision
+                results['recall'][k] += recall
+                results['ndcg'][k] += ndcg
+            users_scored += 1
         except Exception as e:
             print(f"Error evaluating content-based for user {user_id}: {e}")
             continue
     
     # Calculate MAP
-    results['map'] = calculate_map(recommendations, ground_truth, k_values)
+    results['map'] = calculate_map(recommendations, relevant_sets, k_values)
     
     # Average metrics across users
     final_results = {}
     for metric in ['precision', 'recall', 'ndcg']:
         final_results[metric] = {}
         for k in k_values:
-            scores = results[metric][k]
-            final_results[metric][k] = sum(scores) / len(scores) if scores else 0.0
+            final_results[metric][k] = results[metric][k] / users_scored if users_scored else 0.0
     
     final_results['map'] = results['map']
     
     return final_results
 
 
-def collaborative_filtering_for_evaluation(user_id, cursor, excluded_applications: Set[int] = None):
+try:
+    _popcount = int.bit_count  # Python 3.10+
+except AttributeError:
+    def _popcount(mask: int) -> int:
+        return bin(mask).count('1')
+
+
+def load_collaborative_state(cursor) -> Tuple[Dict[int, Set[int]], Dict[int, int], Dict[int, int],
+                                               Dict[int, Dict]]:
+    """
+    Load everything collaborative_filtering_for_evaluation reads, once.
+    
+    Returns:
+        (user_items, item_bits, user_masks, internships_by_id): each
+        student's set of applied internship IDs, a bit per internship ID,
+        each student's applications as a bitmask, and internships (with
+        company_name) by ID. None of them are modified by the evaluation.
+    """
+    # Build user-item matrix
+    # Streamed as plain tuples, as in get_ground_truth
+    app_cursor = cursor.connection.cursor()
+    app_cursor.row_factory = None
+    app_cursor.execute("SELECT student_id, internship_id FROM applications")
+    user_items = {}
+    for student_id, internship_id in app_cursor:
+        if student_id not in user_items:
+            user_items[student_id] = set()
+        user_items[student_id].add(internship_id)
+    
+    # The same sets as bitmasks: one bit per applied-to internship, so
+    # comparing two students is an AND plus a popcount on machine words
+    item_bits = {}
+    for apps in user_items.values():
+        for internship_id in apps:
+            if internship_id not in item_bits:
+                item_bits[internship_id] = 1 << len(item_bits)
+    user_masks = {student_id: sum(item_bits[internship_id] for internship_id in apps)
+                  for student_id, apps in user_items.items()}
+    
+    cursor.execute('''
+        SELECT i.id, i.title, i.description, i.required_skills, i.posted_at, i.company_id,
+               CASE WHEN u.id IS NULL THEN 'Unknown Company' ELSE u.name END as company_name
+        FROM internships i
+        LEFT JOIN users u ON u.id = i.company_id
+    ''')
+    # Plain dicts so the state can be pickled to worker processes
+    internships_by_id = {row['id']: dict(row) for row in cursor}
+    
+    return user_items, item_bits, user_masks, internships_by_id
+
+
+def collaborative_filtering_for_evaluation(user_id, cursor, excluded_applications: Set[int] = None, state=None,
+                                           ids_only: bool = False):
     """
     Collaborative filtering for evaluation with train/test split support.
     This version allows excluding certain applications (test set) from the user's history.
@@ -346,25 +605,20 @@ def collaborative_filtering_for_evaluation(user_id, cursor, excluded_application
         cursor: Database cursor
         excluded_applications: Set of internship IDs to exclude from user's application history
                               (these are the test items we want to predict)
+        state: Result of load_collaborative_state, shared across users;
+               loaded from cursor when omitted
+        ids_only: Return just the recommended internship IDs, skipping the
+                  per-recommendation dictionaries the metrics never read
     
     Returns:
-        List of recommendation dictionaries
+        List of recommendation dictionaries (or IDs, with ids_only)
     """
     if excluded_applications is None:
         excluded_applications = set()
     
-    # Get all applications
-    cursor.execute("SELECT student_id, internship_id FROM applications")
-    all_applications = cursor.fetchall()
-    
-    # Build user-item matrix
-    user_items = {}
-    for app in all_applications:
-        student_id = app['student_id']
-        internship_id = app['internship_id']
-        if student_id not in user_items:
-            user_items[student_id] = set()
-        user_items[student_id].add(internship_id)
+    if state is None:
+        state = load_collaborative_state(cursor)
+    user_items, item_bits, user_masks, internships_by_id = state
     
     # For the target user, exclude test set applications from their history
     # This simulates a train/test split
@@ -375,59 +629,88 @@ def collaborative_filtering_for_evaluation(user_id, cursor, excluded_application
         return []
     
     # Find similar students based on Jaccard similarity (using training set only)
-    similar_students = []
+    current_user_mask = sum(item_bits[internship_id] for internship_id in current_user_apps)
+    current_user_size = len(current_user_apps)
     
-    for student_id, apps in user_items.items():
-        if student_id == user_id:
-            continue
+    def similar_students():
+        for student_id, apps in user_items.items():
+            if student_id == user_id:
+                continue
             
-        intersection = len(current_user_apps & apps)
-        union = len(current_user_apps | apps)
-        similarity = intersection / union if union > 0 else 0
-        
-        if similarity > 0:
-            similar_students.append((student_id, similarity))
+            intersection = _popcount(current_user_mask & user_masks[student_id])
+            if intersection:
+                # |A ∪ B| = |A| + |B| - |A ∩ B|
+                yield student_id, intersection / (current_user_size + len(apps) - intersection)
     
-    # Sort by similarity
-    similar_students.sort(key=lambda x: x[1], reverse=True)
+    # Top 3 similar students in one pass, without materializing every
+    # candidate; ties keep their original order, as a stable sort would
+    top_similar = heapq.nlargest(3, similar_students(), key=itemgetter(1))
     
     # Get top internships from similar students
     recommendations = []
-    seen_internships = set(current_user_apps)  # Exclude internships in training set
+    added = set()
     
-    for student_id, similarity in similar_students[:3]:  # Top 3 similar students
+    for student_id, similarity in top_similar:
         for internship_id in user_items[student_id]:
-            if internship_id not in seen_internships:
-                cursor.execute("SELECT * FROM internships WHERE id=?", (internship_id,))
-                internship = cursor.fetchone()
+            # Exclude internships in training set and ones already added
+            if internship_id not in current_user_apps and internship_id not in added:
+                internship = internships_by_id.get(internship_id)
                 if internship:
-                    # Get company information
-                    cursor.execute("SELECT name FROM users WHERE id=?", (internship['company_id'],))
-                    company = cursor.fetchone()
-                    company_name = company['name'] if company else 'Unknown Company'
-                    
-                    recommendations.append({
+                    recommendations.append(internship_id if ids_only else {
                         'id': internship['id'],
                         'title': internship['title'],
                         'description': internship['description'],
                         'required_skills': internship['required_skills'],
                         'posted_at': internship['posted_at'],
-                        'company_name': company_name,
+                        'company_name': internship['company_name'],
                         'company_id': internship['company_id'],
                         'similarity': similarity,
                         'type': 'Collaborative'
                     })
-                    seen_internships.add(internship_id)
+                    added.add(internship_id)
     
     return recommendations[:20]  # Return more recommendations for evaluation
 
 
+# Set in each worker process by _init_collaborative_worker
+_collaborative_worker_state = None
+
+
+def _init_collaborative_worker(state):
+    global _collaborative_worker_state
+    _collaborative_worker_state = state
+
+
+def _collaborative_recommended_ids(splits: List[Tuple[int, Set[int]]], state=None) -> List[Optional[List[int]]]:
+    """
+    Recommended internship IDs for each (user_id, test_set) split, or None
+    where recommending failed. Worker processes omit state and use the one
+    their initializer received.
+    """
+    if state is None:
+        state = _collaborative_worker_state
+    
+    recommended = []
+    for user_id, test_set in splits:
+        try:
+            recommended.append(collaborative_filtering_for_evaluation(
+                user_id, None, excluded_applications=test_set, state=state, ids_only=True))
+        except Exception as e:
+            print(f"Error evaluating collaborative for user {user_id}: {e}")
+            import traceback
+            traceback.print_exc()
+            recommended.append(None)
+    return recommended
+
+
 def evaluate_collaborative_filtering(
     conn: sqlite3.Connection,
     user_ids: List[int],
     ground_truth: Dict[int, List[int]],
     k_values: List[int] = [5, 10, 20],
-    test_split_ratio: float = 0.2
+    test_split_ratio: float = 0.2,
+    workers: Optional[int] = None,
+    state=None
 ) -> Dict[str, Dict[int, float]]:
     """
     Evaluate Collaborative Filtering algorithm using train/test split.
@@ -443,26 +726,41 @@ def evaluate_collaborative_filtering(
         ground_truth: Dictionary mapping user_id to list of applied internship IDs
         k_values: List of K values for evaluation
         test_split_ratio: Ratio of applications to use as test set (default 0.2 = 20%)
+        workers: Number of worker processes to compute recommendations in.
+            Only used for at least COLLAB_PARALLEL_MIN_USERS users.
+        state: Result of load_collaborative_state; loaded here when omitted
     
     Returns:
         Dictionary with metrics: {'precision': {k: score}, 'recall': {k: score}, ...}
     """
     import random
-    random.seed(42)  # For reproducibility
+    # Own generator, seeded for reproducibility, so the global random state
+    # is left alone
+    shuffle = random.Random(42).shuffle
     
     cursor = conn.cursor()
     cursor.row_factory = sqlite3.Row
     
+    # Running totals per K; every scored user contributes to each K
     results = {
-        'precision': defaultdict(list),
-        'recall': defaultdict(list),
-        'ndcg': defaultdict(list),
+        'precision': defaultdict(float),
+        'recall': defaultdict(float),
+        'ndcg': defaultdict(float),
         'map': {}
     }
+    users_scored = 0
     
     recommendations = {}
     test_ground_truth = {}
     
+    # Applications, internships and company names are the same for every
+    # user, so read them once
+    if state is None:
+        state = load_collaborative_state(cursor)
+    
+    # Split every user first, in order, so the seeded shuffles do not depend
+    # on how the recommendation work is divided
+    splits = []
     for user_id in user_ids:
         if user_id not in ground_truth:
             continue
@@ -473,38 +771,42 @@ def evaluate_collaborative_filtering(
         if len(user_applications) < 2:
             continue
         
-        # Split applications into train and test sets
+        # Split applications into train and test sets; the rest of the
+        # user's applications are the training set
         shuffled_apps = user_applications.copy()
-        random.shuffle(shuffled_apps)
+        shuffle(shuffled_apps)
         
         test_size = max(1, int(len(shuffled_apps) * test_split_ratio))
-        test_set = set(shuffled_apps[:test_size])
-        train_set = set(shuffled_apps[test_size:])
+        splits.append((user_id, set(shuffled_apps[:test_size])))
+    
+    # Get collaborative filtering recommendations using training set only
+    if workers and workers > 1 and len(splits) >= COLLAB_PARALLEL_MIN_USERS:
+        # Contiguous shards, merged in order, as in calculate_map
+        from concurrent.futures import ProcessPoolExecutor
         
-        # Get collaborative filtering recommendations using training set only
-        try:
-            recs = collaborative_filtering_for_evaluation(user_id, cursor, excluded_applications=test_set)
-            recommended_ids = [rec['id'] for rec in recs]
-            recommendations[user_id] = recommended_ids
-            
-            # Use test set as ground truth (what we're trying to predict)
-            test_ground_truth[user_id] = list(test_set)
-            relevant_ids = list(test_set)
-            
-            # Calculate metrics for each k
-            for k in k_values:
-                precision = calculate_precision_at_k(recommended_ids, relevant_ids, k)
-                recall = calculate_recall_at_k(recommended_ids, relevant_ids, k)
-                ndcg = calculate_ndcg(recommended_ids, relevant_ids, k)
-                
-                results['precision'][k].append(precision)
-                results['recall'][k].append(recall)
-                results['ndcg'][k].append(ndcg)
-        except Exception as e:
-            print(f"Error evaluating collaborative for user {user_id}: {e}")
-            import traceback
-            traceback.print_exc()
+        size = -(-len(splits) // workers)
+        shards = [splits[i:i + size] for i in range(0, len(splits), size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_collaborative_worker,
+                                 initargs=(state,)) as pool:
+            recommended = [ids for shard_ids in pool.map(_collaborative_recommended_ids, shards)
+                           for ids in shard_ids]
+    else:
+        recommended = _collaborative_recommended_ids(splits, state)
+    
+    for (user_id, test_set), recommended_ids in zip(splits, recommended):
+        if recommended_ids is None:
             continue
+        recommendations[user_id] = recommended_ids
+        
+        # Use test set as ground truth (what we're trying to predict)
+        relevant_ids = test_ground_truth[user_id] = frozenset(test_set)
+        
+        # Calculate metrics for each k
+        for k, (precision, recall, ndcg) in _metrics_at_k(recommended_ids, relevant_ids, k_values).items():
+            results['precision'][k] += precision
+            results['recall'][k] += recall
+            results['ndcg'][k] += ndcg
+        users_scored += 1
     
     # Calculate MAP using test set as ground truth
     results['map'] = calculate_map(recommendations, test_ground_truth, k_values)
@@ -514,8 +816,7 @@ def evaluate_collaborative_filtering(
     for metric in ['precision', 'recall', 'ndcg']:
         final_results[metric] = {}
         for k in k_values:
-            scores = results[metric][k]
-            final_results[metric][k] = sum(scores) / len(scores) if scores else 0.0
+            final_results[metric][k] = results[metric][k] / users_scored if users_scored else 0.0
     
     final_results['map'] = results['map']
     
@@ -526,25 +827,46 @@ def evaluate_hybrid(
     conn: sqlite3.Connection,
     user_ids: List[int],
     ground_truth: Dict[int, List[int]],
-    k_values: List[int] = [5, 10, 20]
+    k_values: List[int] = [5, 10, 20],
+    content_recs: Optional[Dict[int, List[Dict]]] = None,
+    application_state=None
 ) -> Dict[str, Dict[int, float]]:
     """
     Evaluate Hybrid (Content-Based + Collaborative) algorithm.
     
+    Args:
+        content_recs: Precomputed batch_content_based_recommendations output
+            covering user_ids; computed here when omitted
+        application_state: Result of utils.recommendations.load_application_state;
+            loaded here when omitted
+    
     Returns:
         Dictionary with metrics: {'precision': {k: score}, 'recall': {k: score}, ...}
     """
+    from utils.recommendations import collaborative_filtering, load_application_state
+    
     cursor = conn.cursor()
     cursor.row_factory = sqlite3.Row
     
+    # Running totals per K; every scored user contributes to each K
     results = {
-        'precision': defaultdict(list),
-        'recall': defaultdict(list),
-        'ndcg': defaultdict(list),
+        'precision': defaultdict(float),
+        'recall': defaultdict(float),
+        'ndcg': defaultdict(float),
         'map': {}
     }
+    users_scored = 0
     
     recommendations = {}
+    relevant_sets = {}
+    
+    if content_recs is None:
+        content_recs = batch_content_based_recommendations(
+            conn, [user_id for user_id in user_ids if user_id in ground_truth])
+    
+    # Every user's collaborative filtering reads the same applications
+    if application_state is None:
+        application_state = load_application_state(cursor)
     
     for user_id in user_ids:
         if user_id not in ground_truth:
@@ -552,52 +874,39 @@ def evaluate_hybrid(
         
         # Get hybrid recommendations by manually combining content and collaborative
         try:
-            # Get content-based recommendations
-            content_recs = content_based_recommendations(user_id, cursor)
-            
             # Get collaborative filtering recommendations
-            collab_recs = collaborative_filtering(user_id, cursor)
+            collab_recs = collaborative_filtering(user_id, cursor, application_state)
             
-            # Combine and deduplicate (same logic as get_recommendations)
-            all_recs = {rec['id']: rec for rec in content_recs}
-            
-            # Add collaborative recommendations (keep higher similarity if duplicate)
-            for rec in collab_recs:
-                if rec['id'] not in all_recs:
-                    all_recs[rec['id']] = rec
-                else:
-                    # If collaborative recommendation has higher similarity, use it
-                    if rec['similarity'] > all_recs[rec['id']]['similarity']:
-                        all_recs[rec['id']] = rec
-            
-            recommended_ids = [rec['id'] for rec in list(all_recs.values())]
+            # Combine and deduplicate (same logic as get_recommendations).
+            # Keeping the higher-similarity duplicate changes which dict is
+            # kept but never an ID's position, so the ranking is simply each
+            # ID in order of first appearance, content first
+            recommended_ids = list(dict.fromkeys(chain(
+                (rec['id'] for rec in content_recs[user_id]),
+                (rec['id'] for rec in collab_recs))))
             recommendations[user_id] = recommended_ids
             
-            relevant_ids = ground_truth[user_id]
+            relevant_ids = relevant_sets[user_id] = frozenset(ground_truth[user_id])
             
             # Calculate metrics for each k
-            for k in k_values:
-                precision = calculate_precision_at_k(recommended_ids, relevant_ids, k)
-                recall = calculate_recall_at_k(recommended_ids, relevant_ids, k)
-                ndcg = calculate_ndcg(recommended_ids, relevant_ids, k)
-                
-                results['precision'][k].append(precision)
-                results['recall'][k].append(recall)
-                results['ndcg'][k].append(ndcg)
+            for k, (precision, recall, ndcg) in _metrics_at_k(recommended_ids, relevant_ids, k_values).items():
+                results['precision'][k] += precision
+                results['recall'][k] += recall
+                results['ndcg'][k] += ndcg
+            users_scored += 1
         except Exception as e:
             print(f"Error evaluating hybrid for user {user_id}: {e}")
             continue
     
     # Calculate MAP
-    results['map'] = calculate_map(recommendations, ground_truth, k_values)
+    results['map'] = calculate_map(recommendations, relevant_sets, k_values)
     
     # Average metrics across users
     final_results = {}
     for metric in ['precision', 'recall', 'ndcg']:
         final_results[metric] = {}
         for k in k_values:
-            scores = results[metric][k]
-            final_results[metric][k] = sum(scores) / len(scores) if scores else 0.0
+            final_results[metric][k] = results[metric][k] / users_scored if users_scored else 0.0
     
     final_results['map'] = results['map']
     
@@ -613,6 +922,13 @@ class ABTest:
     A/B Testing framework for comparing recommendation algorithms.
     """
     
+    # Algorithm name -> (evaluator, keyword it takes precomputed input as)
+    ALGORITHMS = {
+        'content': (evaluate_content_based, 'content_recs'),
+        'collaborative': (evaluate_collaborative_filtering, 'state'),
+        'hybrid': (evaluate_hybrid, 'content_recs'),
+    }
+    
     def __init__(self, conn: sqlite3.Connection, group_a_algorithm: str, group_b_algorithm: str):
         """
         Initialize A/B test.
@@ -660,6 +976,7 @@ class ABTest:
             Dictionary with results for both groups
         """
         ground_truth = get_ground_truth(self.conn)
+        shared = self._load_shared_inputs(ground_truth)
         
         # Evaluate Group A
         print(f"\nEvaluating Group A: {self.group_a_algorithm}")
@@ -667,7 +984,8 @@ class ABTest:
             self.group_a_algorithm,
             self.group_a_users,
             ground_truth,
-            k_values
+            k_values,
+            shared
         )
         
         # Evaluate Group B
@@ -676,7 +994,8 @@ class ABTest:
             self.group_b_algorithm,
             self.group_b_users,
             ground_truth,
-            k_values
+            k_values,
+            shared
         )
         
         return {
@@ -692,23 +1011,69 @@ class ABTest:
             }
         }
     
+    def _load_shared_inputs(self, ground_truth: Dict[int, List[int]]) -> Dict:
+        """
+        Precompute what the two groups' evaluators can share, keyed by the
+        keyword argument each evaluator accepts it as.
+        """
+        keywords = {self._lookup(algorithm)[1]
+                    for algorithm in (self.group_a_algorithm, self.group_b_algorithm)}
+        shared = {}
+        
+        if 'content_recs' in keywords:
+            shared['content_recs'] = batch_content_based_recommendations(
+                self.conn, [user_id for user_id in self.group_a_users + self.group_b_users
+                            if user_id in ground_truth])
+        if 'state' in keywords:
+            cursor = self.conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            shared['state'] = load_collaborative_state(cursor)
+        
+        return shared
+    
+    def _lookup(self, algorithm: str):
+        """The (evaluator, shared input keyword) pair for an algorithm name."""
+        try:
+            return self.ALGORITHMS[algorithm]
+        except KeyError:
+            raise ValueError(f"Unknown algorithm: {algorithm}") from None
+    
     def _evaluate_algorithm(self, algorithm: str, user_ids: List[int], 
-                           ground_truth: Dict[int, List[int]], k_values: List[int]) -> Dict:
+                           ground_truth: Dict[int, List[int]], k_values: List[int],
+                           shared: Optional[Dict] = None) -> Dict:
         """Evaluate a specific algorithm."""
-        if algorithm == 'content':
-            return evaluate_content_based(self.conn, user_ids, ground_truth, k_values)
-        elif algorithm == 'collaborative':
-            return evaluate_collaborative_filtering(self.conn, user_ids, ground_truth, k_values)
-        elif algorithm == 'hybrid':
-            return evaluate_hybrid(self.conn, user_ids, ground_truth, k_values)
-        else:
-            raise ValueError(f"Unknown algorithm: {algorithm}")
+        evaluate, keyword = self._lookup(algorithm)
+        kwargs = {keyword: shared[keyword]} if shared and keyword in shared else {}
+        return evaluate(self.conn, user_ids, ground_truth, k_values, **kwargs)
 
 
 # ============================================================================
 # COMPREHENSIVE EVALUATION REPORT
 # ============================================================================
 
+def to_json_bytes(data, indent: bool = True) -> bytes:
+    """
+    Serialize evaluation results as UTF-8 JSON, indented unless indent=False.
+    
+    Uses orjson when it is installed and falls back to the standard
+    library otherwise; integer keys (K values) become strings either way.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    import json  # only needed without orjson
+    if indent:
+        return json.dumps(data, indent=2).encode()
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def to_json(data, indent: bool = True) -> str:
+    """Serialize evaluation results as JSON text (see to_json_bytes)."""
+    return to_json_bytes(data, indent).decode()
+
+
 def generate_evaluation_report(
     content_results: Dict,
     collaborative_results: Dict,
@@ -797,8 +1162,8 @@ def generate_evaluation_report(
     report['summary'] = summary
     
     # Save to file
-    with open(output_file, 'w') as f:
-        json.dump(report, f, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(to_json_bytes(report))
     
     print(f"\nEvaluation report saved to: {output_file}")
     
@@ -849,7 +1214,9 @@ def run_comprehensive_evaluation(
     db_path: str = "internship.db",
     k_values: List[int] = [5, 10, 20],
     output_file: str = "evaluation_report.json",
-    ab_test: bool = False
+    ab_test: bool = False,
+    workers: Optional[int] = None,
+    conn: Optional[sqlite3.Connection] = None
 ) -> Dict:
     """
     Run comprehensive offline evaluation for all three algorithms.
@@ -859,82 +1226,100 @@ def run_comprehensive_evaluation(
         k_values: List of K values to evaluate
         output_file: Path to save evaluation report
         ab_test: Whether to run A/B testing
+        workers: Worker processes for the collaborative filtering evaluation
+        conn: Already-open connection to evaluate on (e.g. the one the
+            validation used); left open for the caller. Opened read-only
+            from db_path when omitted.
     
     Returns:
         Comprehensive evaluation report
     """
-    # Connect to database
-    if not os.path.exists(db_path):
-        print(f"Error: Database file not found at {db_path}")
-        return {}
-    
-    # For evaluation, we need to mock Flask app context
-    # Create a direct SQLite connection instead
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    
-    print("="*80)
-    print("OFFLINE EVALUATION - INTERNSHIP RECOMMENDATION SYSTEM")
-    print("="*80)
-    print(f"Database: {db_path}")
-    print(f"K values: {k_values}")
-    print(f"Timestamp: {datetime.now().isoformat()}\n")
-    
-    # Get ground truth and user IDs
-    print("Loading ground truth data...")
-    ground_truth = get_ground_truth(conn)
-    user_ids = list(ground_truth.keys())
-    
-    print(f"Found {len(user_ids)} users with application history")
-    print(f"Total applications: {sum(len(apps) for apps in ground_truth.values())}\n")
-    
-    if not user_ids:
-        print("Warning: No users with application history found. Evaluation requires ground truth data.")
-        conn.close()
-        return {}
-    
-    # Evaluate Content-Based Filtering
-    print("Evaluating Content-Based Filtering...")
-    content_results = evaluate_content_based(conn, user_ids, ground_truth, k_values)
-    
-    # Evaluate Collaborative Filtering
-    print("Evaluating Collaborative Filtering...")
-    collaborative_results = evaluate_collaborative_filtering(conn, user_ids, ground_truth, k_values)
-    
-    # Evaluate Hybrid Approach
-    print("Evaluating Hybrid Approach...")
-    hybrid_results = evaluate_hybrid(conn, user_ids, ground_truth, k_values)
-    
-    # Generate comprehensive report
-    print("\nGenerating evaluation report...")
-    report = generate_evaluation_report(
-        content_results,
-        collaborative_results,
-        hybrid_results,
-        output_file
-    )
+    owns_conn = conn is None
+    if owns_conn:
+        # Connect to database
+        if not os.path.exists(db_path):
+            print(f"Error: Database file not found at {db_path}")
+            return {}
+        
+        # For evaluation, we need to mock Flask app context
+        # Create a direct SQLite connection instead
+        conn = connect_readonly(db_path)
     
-    # Print report
-    print_evaluation_report(report)
+    # One read transaction for the whole run: every query sees the same
+    # snapshot and the shared lock is taken once
+    began = not conn.in_transaction
+    if began:
+        conn.execute("BEGIN")
     
-    # Run A/B testing if requested
-    if ab_test:
-        print("\n" + "="*80)
-        print("A/B TESTING")
+    try:
+        print("="*80)
+        print("OFFLINE EVALUATION - INTERNSHIP RECOMMENDATION SYSTEM")
         print("="*80)
+        print(f"Database: {db_path}")
+        print(f"K values: {k_values}")
+        print(f"Timestamp: {datetime.now().isoformat()}\n")
         
-        ab_test_instance = ABTest(conn, 'content', 'hybrid')
-        ab_test_instance.split_users(user_ids, split_ratio=0.5, random_seed=42)
-        ab_results = ab_test_instance.run_ab_test(k_values)
+        # Get ground truth and user IDs
+        print("Loading ground truth data...")
+        ground_truth = get_ground_truth(conn)
+        user_ids = list(ground_truth.keys())
         
-        print("\nA/B Test Results:")
-        print(json.dumps(ab_results, indent=2))
+        print(f"Found {len(user_ids)} users with application history")
+        print(f"Total applications: {sum(len(apps) for apps in ground_truth.values())}\n")
         
-        report['ab_test'] = ab_results
-    
-    conn.close()
-    
-    return report
+        if not user_ids:
+            print("Warning: No users with application history found. Evaluation requires ground truth data.")
+            return {}
+        
+        # Content-based scores are shared by the content and hybrid evaluations
+        content_recs = batch_content_based_recommendations(conn, user_ids)
+        
+        # Evaluate Content-Based Filtering
+        print("Evaluating Content-Based Filtering...")
+        content_results = evaluate_content_based(conn, user_ids, ground_truth, k_values, content_recs)
+        
+        # Evaluate Collaborative Filtering
+        print("Evaluating Collaborative Filtering...")
+        collaborative_results = evaluate_collaborative_filtering(conn, user_ids, ground_truth, k_values,
+                                                                 workers=workers)
+        
+        # Evaluate Hybrid Approach
+        print("Evaluating Hybrid Approach...")
+        hybrid_results = evaluate_hybrid(conn, user_ids, ground_truth, k_values, content_recs)
+        
+        # Generate comprehensive report
+        print("\nGenerating evaluation report...")
+        report = generate_evaluation_report(
+            content_results,
+            collaborative_results,
+            hybrid_results,
+            output_file
+        )
+        
+        # Print report
+        print_evaluation_report(report)
+        
+        # Run A/B testing if requested
+        if ab_test:
+            print("\n" + "="*80)
+            print("A/B TESTING")
+            print("="*80)
+        
+            ab_test_instance = ABTest(conn, 'content', 'hybrid')
+            ab_test_instance.split_users(user_ids, split_ratio=0.5, random_seed=42)
+            ab_results = ab_test_instance.run_ab_test(k_values)
+        
+            print("\nA/B Test Results:")
+            print(to_json(ab_results))
+        
+            report['ab_test'] = ab_results
+        
+        return report
+    finally:
+        if owns_conn:
+            conn.close()
+        elif began:
+            conn.rollback()
 
 
 # ============================================================================
@@ -1056,12 +1441,24 @@ def validate_collaborative_filtering_algorithm(conn: sqlite3.Connection) -> Dict
     }
 
 
-def validate_hybrid_algorithm(conn: sqlite3.Connection) -> Dict:
+def validate_hybrid_algorithm(
+    conn: sqlite3.Connection,
+    content_validation: Optional[Dict] = None,
+    collaborative_validation: Optional[Dict] = None
+) -> Dict:
     """
     Validate Hybrid algorithm characteristics.
+    
+    Args:
+        content_validation: validate_content_based_algorithm result to reuse;
+            queried here when omitted
+        collaborative_validation: validate_collaborative_filtering_algorithm
+            result to reuse; queried here when omitted
     """
-    content_validation = validate_content_based_algorithm(conn)
-    collaborative_validation = validate_collaborative_filtering_algorithm(conn)
+    if content_validation is None:
+        content_validation = validate_content_based_algorithm(conn)
+    if collaborative_validation is None:
+        collaborative_validation = validate_collaborative_filtering_algorithm(conn)
     
     return {
         'content_based': content_validation,
@@ -1074,40 +1471,64 @@ def validate_hybrid_algorithm(conn: sqlite3.Connection) -> Dict:
 # MAIN EXECUTION
 # ============================================================================
 
-if __name__ == "__main__":
+# Command-line defaults, shared by the parser and the no-argument fast path
+CLI_DEFAULTS = {
+    'db': 'internship.db',
+    'k': [5, 10, 20],
+    'output': 'evaluation_report.json',
+    'ab_test': False,
+    'validate': False,
+    'workers': None,
+}
+
+
+def parse_args(argv: List[str]):
+    """Parse command-line arguments."""
     import argparse
     
     parser = argparse.ArgumentParser(description='Offline Evaluation for Internship Recommendation System')
-    parser.add_argument('--db', type=str, default='internship.db', help='Path to database file')
-    parser.add_argument('--k', type=int, nargs='+', default=[5, 10, 20], help='K values for evaluation')
-    parser.add_argument('--output', type=str, default='evaluation_report.json', help='Output file for report')
+    parser.add_argument('--db', type=str, help='Path to database file')
+    parser.add_argument('--k', type=int, nargs='+', help='K values for evaluation')
+    parser.add_argument('--output', type=str, help='Output file for report')
     parser.add_argument('--ab-test', action='store_true', help='Run A/B testing')
     parser.add_argument('--validate', action='store_true', help='Run algorithm-specific validation')
+    parser.add_argument('--workers', type=int,
+                        help='Worker processes for collaborative filtering on large user sets')
+    parser.set_defaults(**CLI_DEFAULTS)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        args = parse_args(sys.argv[1:])
+    else:
+        # Nothing to parse: skip importing and building argparse
+        from types import SimpleNamespace
+        args = SimpleNamespace(**CLI_DEFAULTS)
     
-    args = parser.parse_args()
+    # Validation and the comprehensive run share one read-only connection
+    conn = connect_readonly(args.db) if os.path.exists(args.db) else None
     
-    # Run validation if requested
-    if args.validate:
+    # Run validation if requested; indent the JSON only for a terminal,
+    # piped output is read by tools
+    if args.validate and conn is not None:
+        pretty = sys.stdout.isatty()
         print("="*80)
         print("ALGORITHM-SPECIFIC VALIDATION")
         print("="*80)
         
-        conn = sqlite3.connect(args.db)
-        conn.row_factory = sqlite3.Row
-        
         print("\nContent-Based Algorithm Validation:")
         content_val = validate_content_based_algorithm(conn)
-        print(json.dumps(content_val, indent=2))
+        print(to_json(content_val, pretty))
         
         print("\nCollaborative Filtering Algorithm Validation:")
         collab_val = validate_collaborative_filtering_algorithm(conn)
-        print(json.dumps(collab_val, indent=2))
+        print(to_json(collab_val, pretty))
         
         print("\nHybrid Algorithm Validation:")
-        hybrid_val = validate_hybrid_algorithm(conn)
-        print(json.dumps(hybrid_val, indent=2))
+        hybrid_val = validate_hybrid_algorithm(conn, content_val, collab_val)
+        print(to_json(hybrid_val, pretty))
         
-        conn.close()
         print("\n")
     
     # Run comprehensive evaluation
@@ -1115,8 +1536,12 @@ if __name__ == "__main__":
         db_path=args.db,
         k_values=args.k,
         output_file=args.output,
-        ab_test=args.ab_test
+        ab_test=args.ab_test,
+        workers=args.workers,
+        conn=conn
     )
+    if conn is not None:
+        conn.close()
     
     print("\n" + "="*80)
     print("EVALUATION COMPLETE")
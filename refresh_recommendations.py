@@ -0,0 +1,33 @@
+# refresh_recommendations.py - Precompute recommendations for every student
+"""
+Recompute every student's recommendations into the recommendations_cache
+table so dashboards read them with one indexed lookup.
+
+Run it once from cron, or keep it running with --every:
+    python refresh_recommendations.py
+    python refresh_recommendations.py --every 15
+"""
+
+import argparse
+import time
+
+from app_new import create_app
+from utils.recommendations import refresh_recommendations
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute internship recommendations')
+    parser.add_argument('--every', type=float, metavar='MINUTES',
+                        help='Keep running and refresh every MINUTES minutes')
+    args = parser.parse_args()
+
+    app = create_app()
+    while True:
+        with app.app_context():
+            count = refresh_recommendations()
+        print(f"Refreshed recommendations for {count} students")
+        if not args.every:
+            return 0
+        time.sleep(args.every * 60)
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -6,6 +6,9 @@ Simple wrapper script to run offline evaluation with better error handling.
 import sys
 import os
 
+# Size of the header at the start of every SQLite database file
+SQLITE_HEADER_SIZE = 100
+
 def main():
     print("="*80)
     print("OFFLINE EVALUATION RUNNER")
@@ -14,7 +17,9 @@ def main():
     
     # Check if database exists
     db_path = "internship.db"
-    if not os.path.exists(db_path):
+    try:
+        db_size = os.stat(db_path).st_size
+    except FileNotFoundError:
         print(f"ERROR: Database file not found: {db_path}")
         print(f"Please ensure the database exists in the project root.")
         print()
@@ -22,6 +27,16 @@ def main():
         print("  1. Run the Flask app first to create the database")
         print("  2. Or specify a different database path: python offline_evaluation.py --db your_db.db")
         return 1
+    except OSError as e:
+        print(f"ERROR: Cannot read database file {db_path}: {e}")
+        return 1
+    
+    # Anything shorter than the SQLite header holds no tables, so don't
+    # bother opening it
+    if db_size < SQLITE_HEADER_SIZE:
+        print(f"ERROR: Database file is empty: {db_path}")
+        print("Run the Flask app first to create the tables and sample data.")
+        return 1
     
     print(f"Database found: {db_path}")
     
@@ -31,12 +46,9 @@ def main():
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        # Check applications table
-        cursor.execute("SELECT COUNT(*) FROM applications")
-        app_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(DISTINCT student_id) FROM applications")
-        user_count = cursor.fetchone()[0]
+        # Check applications table (both counts in one pass)
+        cursor.execute("SELECT COUNT(*), COUNT(DISTINCT student_id) FROM applications")
+        app_count, user_count = cursor.fetchone()
         
         conn.close()
         
@@ -92,7 +104,8 @@ def main():
             print("To view results:")
             print("  1. Check the console output above")
             print("  2. Open evaluation_report.json in a text editor")
-            print("  3. Or use: python -c \"import json; print(json.dump(open('evaluation_report.json').read(), indent=2))\"")
+            print("  3. Or use: python -m json.tool evaluation_report.json")
+            print("  4. Or, with jq installed: jq . evaluation_report.json")
             return 0
         else:
             print("Evaluation completed but returned no results.")
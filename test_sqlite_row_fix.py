@@ -2,15 +2,15 @@
 """
 Test script to verify the sqlite3.Row conversion fix
 """
-import sqlite3
 from datetime import datetime
+from utils.database import _connect
 
 def test_sqlite_row_conversion():
-    """Test the sqlite3.Row to dict conversion logic"""
+    """Test the sqlite3.Row timestamp conversion used by student.py"""
     
-    # Create a test database in memory with row_factory to return Row objects
-    conn = sqlite3.connect(':memory:')
-    conn.row_factory = sqlite3.Row  # This makes fetchone() return Row objects
+    # An app-configured connection: Row objects, and columns aliased as
+    # "name [timestamp]" parsed into datetime objects by the app's converter
+    conn = _connect(':memory:')
     irs = conn.cursor()
     
     # Create a test table
@@ -29,40 +29,23 @@ def test_sqlite_row_conversion():
         VALUES (1, 'Test User', '2024-01-15 14:30:25')
     ''')
     
-    # Fetch data (this returns a sqlite3.Row object)
-    irs.execute("SELECT * FROM test_cvs WHERE user_id=?", (1,))
-    cv_row = irs.fetchone()
+    # Fetch data the way student.py does; no dict copy of the row is
+    # needed, since nothing has to be converted after fetching
+    irs.execute('''SELECT full_name, updated_at as "updated_at [timestamp]"
+                   FROM test_cvs WHERE user_id=?''', (1,))
+    cv = irs.fetchone()
     
-    print("Original sqlite3.Row:")
-    print(f"Type: {type(cv_row)}")
-    print(f"updated_at: {cv_row['updated_at']} (type: {type(cv_row['updated_at'])})")
+    print("Fetched sqlite3.Row:")
+    print(f"Type: {type(cv)}")
+    print(f"updated_at: {cv['updated_at']} (type: {type(cv['updated_at'])})")
     
-    # Test the conversion logic from student.py
-    cv = None
-    if cv_row:
-        cv = dict(cv_row)
-        print(f"\nAfter dict conversion:")
-        print(f"Type: {type(cv)}")
-        print(f"updated_at: {cv['updated_at']} (type: {type(cv['updated_at'])})")
-        
-        # Convert string timestamps to datetime objects
-        if cv['updated_at']:
-            try:
-                if isinstance(cv['updated_at'], str):
-                    cv['updated_at'] = datetime.strptime(cv['updated_at'], '%Y-%m-%d %H:%M:%S')
-            except (ValueError, TypeError):
-                cv['updated_at'] = None
-        
-        print(f"\nAfter datetime conversion:")
-        print(f"updated_at: {cv['updated_at']} (type: {type(cv['updated_at'])})")
-        
-        # Test strftime
-        if cv['updated_at']:
-            formatted = cv['updated_at'].strftime('%B %d, %Y')
-            print(f"Formatted: {formatted}")
-            print("✅ Conversion successful!")
-        else:
-            print("❌ Conversion failed!")
+    # Test strftime
+    if isinstance(cv['updated_at'], datetime):
+        formatted = cv['updated_at'].strftime('%B %d, %Y')
+        print(f"Formatted: {formatted}")
+        print("✅ Conversion successful!")
+    else:
+        print("❌ Conversion failed!")
     
     conn.close()
 
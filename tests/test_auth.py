@@ -1,9 +1,27 @@
 """
 Test suite for authentication functions.
-Tests password hashing and verification.
+Tests password hashing, verification and role checks.
 """
 import unittest
-from utils.auth import hash_password, check_password
+from flask import Flask
+from utils import auth
+from utils.auth import hash_password, check_password, require_role
+
+# Production scrypt cost makes every hash take a noticeable fraction of a
+# second; these tests check behaviour, not cost, so use a cheap setting
+FAST_HASH_METHOD = 'scrypt:1024:8:1'
+
+
+def setUpModule():
+    global _production_method
+    _production_method = auth.PASSWORD_HASH_METHOD
+    auth.PASSWORD_HASH_METHOD = FAST_HASH_METHOD
+    auth._dummy_hash.cache_clear()
+
+
+def tearDownModule():
+    auth.PASSWORD_HASH_METHOD = _production_method
+    auth._dummy_hash.cache_clear()
 
 
 class TestPasswordHashing(unittest.TestCase):
@@ -34,6 +52,10 @@ class TestPasswordHashing(unittest.TestCase):
         # They should be different due to salt
         self.assertNotEqual(hash1, hash2,
                           "Same password should produce different hashes (salted)")
+
+        # Hashes are 'method$salt$hash'; the difference comes from the salt
+        self.assertNotEqual(hash1.split('$')[1], hash2.split('$')[1],
+                          "Each hash should get its own salt")
     
     def test_hash_password_handles_special_characters(self):
         """Test that password hashing handles special characters."""
@@ -105,6 +127,80 @@ class TestPasswordVerification(unittest.TestCase):
         self.assertFalse(is_invalid,
                         "Should reject wrong password")
 
+    def test_production_hash_verifies(self):
+        """Test a hash made at the production cost, and that a cheap one still verifies under it."""
+        cheap_hash = hash_password('password123')
+        auth.PASSWORD_HASH_METHOD = _production_method
+        try:
+            hashed = hash_password('password123')
+        finally:
+            auth.PASSWORD_HASH_METHOD = FAST_HASH_METHOD
+        
+        self.assertNotEqual(hashed.split('$')[0], FAST_HASH_METHOD,
+                          "Production hashes should not use the test cost")
+        self.assertTrue(check_password('password123', hashed))
+        self.assertTrue(check_password('password123', cheap_hash),
+                      "A hash verifies with the method it records")
+
+    def test_check_password_missing_hash_returns_false(self):
+        """Test that a missing hash (unknown user) is rejected."""
+        result = check_password('anypassword', None)
+
+        self.assertFalse(result,
+                        "Missing hash should never verify")
+
+
+class TestRequireRole(unittest.TestCase):
+    """Test the require_role view decorator."""
+    
+    def setUp(self):
+        """Set up a minimal app with protected views."""
+        self.app = Flask(__name__)
+        self.app.secret_key = 'test'
+        self.app.add_url_rule('/login', 'auth.login', lambda: 'login')
+        
+        @self.app.route('/page')
+        @require_role('company')
+        def page():
+            return 'page'
+        
+        @self.app.route('/api', methods=['POST'])
+        @require_role('company', api=True)
+        def api():
+            return 'api'
+        
+        self.client = self.app.test_client()
+    
+    def login_as(self, role):
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['role'] = role
+    
+    def test_matching_role_reaches_view(self):
+        """Test that a user with the required role gets the view."""
+        self.login_as('company')
+        response = self.client.get('/page')
+        
+        self.assertEqual(response.data, b'page',
+                       "Matching role should reach the view")
+    
+    def test_wrong_role_redirects_to_login(self):
+        """Test that a page view redirects other roles to login."""
+        self.login_as('student')
+        response = self.client.get('/page')
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.headers['Location'].endswith('/login'),
+                      "Should redirect to the login page")
+    
+    def test_api_view_returns_401_when_logged_out(self):
+        """Test that an API view answers 401 JSON instead of redirecting."""
+        response = self.client.post('/api')
+        
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.get_json(),
+                       {'success': False, 'message': 'Unauthorized'})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,68 @@
+"""
+Test suite for the in-process cache.
+Tests expiry, eviction and invalidation.
+"""
+import unittest
+from unittest import mock
+from utils.cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    """Test TTLCache behaviour."""
+
+    def test_get_returns_stored_value(self):
+        """Test that a stored value is returned before it expires."""
+        cache = TTLCache(timeout=60)
+        cache.set('key', 'value')
+
+        self.assertEqual(cache.get('key'), 'value',
+                       "Should return the cached value")
+
+    def test_get_missing_key_returns_none(self):
+        """Test that an unknown key returns None."""
+        cache = TTLCache()
+
+        self.assertIsNone(cache.get('missing'),
+                        "Missing key should return None")
+
+    def test_entry_expires_after_timeout(self):
+        """Test that entries are dropped once their timeout has passed."""
+        cache = TTLCache(timeout=10)
+        with mock.patch('utils.cache.time.monotonic', return_value=100.0):
+            cache.set('key', 'value')
+        with mock.patch('utils.cache.time.monotonic', return_value=109.0):
+            self.assertEqual(cache.get('key'), 'value',
+                           "Entry should still be valid before the timeout")
+        with mock.patch('utils.cache.time.monotonic', return_value=110.0):
+            self.assertIsNone(cache.get('key'),
+                            "Entry should expire at the timeout")
+
+    def test_maxsize_evicts_entry_closest_to_expiry(self):
+        """Test that a full cache makes room by evicting the oldest entry."""
+        cache = TTLCache(timeout=60, maxsize=2)
+        cache.set('short', 1, timeout=5)
+        cache.set('long', 2, timeout=50)
+        cache.set('new', 3)
+
+        self.assertIsNone(cache.get('short'),
+                        "Entry closest to expiry should be evicted")
+        self.assertEqual(cache.get('long'), 2)
+        self.assertEqual(cache.get('new'), 3)
+
+    def test_delete_and_clear(self):
+        """Test that delete removes one key and clear removes all."""
+        cache = TTLCache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+
+        cache.clear()
+        self.assertIsNone(cache.get('b'),
+                        "Clear should remove every entry")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,8 @@ Tests database initialization and connection.
 """
 import unittest
 import sqlite3
+from datetime import datetime
+from utils.database import _connect
 
 
 class TestDatabaseConnection(unittest.TestCase):
@@ -14,8 +16,8 @@ class TestDatabaseConnection(unittest.TestCase):
         conn = sqlite3.connect(':memory:')
         conn.row_factory = sqlite3.Row
         
-        self.assertIsInstance(conn, sqlite3.Connection,
-                            "Should return a SQLite connection")
+        self.assertIs(type(conn), sqlite3.Connection,
+                    "Should return a SQLite connection")
         
         # Verify connection works
         cursor = conn.cursor()
@@ -31,271 +33,203 @@ class TestDatabaseConnection(unittest.TestCase):
         conn = sqlite3.connect(':memory:')
         conn.row_factory = sqlite3.Row
         
-        self.assertEqual(conn.row_factory, sqlite3.Row,
-                      "Row factory should be set to sqlite3.Row")
+        self.assertIs(conn.row_factory, sqlite3.Row,
+                    "Row factory should be set to sqlite3.Row")
         
         conn.close()
 
 
+EXPECTED_USER_COLUMNS = frozenset(['id', 'email', 'password', 'role', 'name', 'created_at'])
+EXPECTED_TABLES = frozenset(['users', 'profiles', 'internships', 'applications', 'messages', 'cvs'])
+
+# Named shared-cache in-memory database: the schema is created once per
+# class and every test connects to the same database
+SHARED_TEST_DB = 'file:test_database_init?mode=memory&cache=shared'
+
+SCHEMA_SQL = '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL CHECK(role IN ('student', 'company', 'admin')),
+        name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    CREATE TABLE IF NOT EXISTS profiles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        skills TEXT,
+        education TEXT,
+        experience TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+    
+    CREATE TABLE IF NOT EXISTS internships (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        required_skills TEXT,
+        posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (company_id) REFERENCES users (id)
+    );
+    
+    CREATE TABLE IF NOT EXISTS applications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL,
+        internship_id INTEGER NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'pending',
+        FOREIGN KEY (student_id) REFERENCES users (id),
+        FOREIGN KEY (internship_id) REFERENCES internships (id)
+    );
+    
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sender_id INTEGER NOT NULL,
+        receiver_id INTEGER NOT NULL,
+        internship_id INTEGER NOT NULL,
+        content TEXT,
+        sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (sender_id) REFERENCES users (id),
+        FOREIGN KEY (receiver_id) REFERENCES users (id),
+        FOREIGN KEY (internship_id) REFERENCES internships (id)
+    );
+    
+    CREATE TABLE IF NOT EXISTS cvs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        full_name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        phone TEXT,
+        address TEXT,
+        linkedin_url TEXT,
+        github_url TEXT,
+        objective TEXT,
+        education TEXT,
+        work_experience TEXT,
+        projects TEXT,
+        certifications TEXT,
+        languages TEXT,
+        interests TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+'''
+
+
 class TestDatabaseInitialization(unittest.TestCase):
     """Test database table initialization."""
     
+    @classmethod
+    def setUpClass(cls):
+        """Create the schema once; the holder connection keeps the database alive."""
+        cls.holder = sqlite3.connect(SHARED_TEST_DB, uri=True)
+        cls.holder.executescript(SCHEMA_SQL)
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Close the holder connection, which drops the database."""
+        cls.holder.close()
+    
     def setUp(self):
-        """Set up test database."""
-        self.test_db = ':memory:'
+        """Connect to the shared test database."""
+        self.conn = sqlite3.connect(SHARED_TEST_DB, uri=True)
+        self.cursor = self.conn.cursor()
+    
+    def tearDown(self):
+        """Close the test connection."""
+        self.conn.close()
+    
+    def table_exists(self, name):
+        """Check sqlite_master for a table."""
+        self.cursor.execute('''
+            SELECT name FROM sqlite_master 
+            WHERE type='table' AND name=?
+        ''', (name,))
+        return self.cursor.fetchone() is not None
     
     def test_can_create_users_table(self):
         """Test that users table can be created with correct schema."""
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL CHECK(role IN ('student', 'company', 'admin')),
-                name TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Verify table exists
-        cursor.execute('''
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='users'
-        ''')
-        result = cursor.fetchone()
-        
-        self.assertIsNotNone(result,
-                           "Users table should be created")
+        self.assertTrue(self.table_exists('users'),
+                       "Users table should be created")
         
         # Verify table structure
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        expected_columns = ['id', 'email', 'password', 'role', 'name', 'created_at']
-        for col in expected_columns:
-            self.assertIn(col, columns,
-                        f"Users table should have {col} column")
+        self.cursor.execute("PRAGMA table_info(users)")
+        columns = {row[1] for row in self.cursor.fetchall()}
         
-        conn.close()
+        missing = EXPECTED_USER_COLUMNS - columns
+        self.assertFalse(missing,
+                        f"Users table is missing columns: {sorted(missing)}")
     
     def test_can_create_profiles_table(self):
         """Test that profiles table can be created."""
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS profiles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                skills TEXT,
-                education TEXT,
-                experience TEXT,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='profiles'
-        ''')
-        result = cursor.fetchone()
-        
-        self.assertIsNotNone(result,
-                           "Profiles table should be created")
-        
-        conn.close()
+        self.assertTrue(self.table_exists('profiles'),
+                       "Profiles table should be created")
     
     def test_can_create_internships_table(self):
         """Test that internships table can be created."""
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS internships (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                company_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT,
-                required_skills TEXT,
-                posted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (company_id) REFERENCES users (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='internships'
-        ''')
-        result = cursor.fetchone()
-        
-        self.assertIsNotNone(result,
-                           "Internships table should be created")
-        
-        conn.close()
+        self.assertTrue(self.table_exists('internships'),
+                       "Internships table should be created")
     
     def test_can_create_applications_table(self):
         """Test that applications table can be created."""
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id INTEGER NOT NULL,
-                internship_id INTEGER NOT NULL,
-                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'pending',
-                FOREIGN KEY (student_id) REFERENCES users (id),
-                FOREIGN KEY (internship_id) REFERENCES internships (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='applications'
-        ''')
-        result = cursor.fetchone()
-        
-        self.assertIsNotNone(result,
-                           "Applications table should be created")
-        
-        conn.close()
+        self.assertTrue(self.table_exists('applications'),
+                       "Applications table should be created")
     
     def test_can_create_messages_table(self):
         """Test that messages table can be created."""
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sender_id INTEGER NOT NULL,
-                receiver_id INTEGER NOT NULL,
-                internship_id INTEGER NOT NULL,
-                content TEXT,
-                sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (sender_id) REFERENCES users (id),
-                FOREIGN KEY (receiver_id) REFERENCES users (id),
-                FOREIGN KEY (internship_id) REFERENCES internships (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='messages'
-        ''')
-        result = cursor.fetchone()
-        
-        self.assertIsNotNone(result,
-                           "Messages table should be created")
-        
-        conn.close()
+        self.assertTrue(self.table_exists('messages'),
+                       "Messages table should be created")
     
     def test_can_create_cvs_table(self):
         """Test that CVs table can be created."""
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cvs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                full_name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                phone TEXT,
-                address TEXT,
-                linkedin_url TEXT,
-                github_url TEXT,
-                objective TEXT,
-                education TEXT,
-                work_experience TEXT,
-                projects TEXT,
-                certifications TEXT,
-                languages TEXT,
-                interests TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='cvs'
-        ''')
-        result = cursor.fetchone()
-        
-        self.assertIsNotNone(result,
-                           "CVs table should be created")
-        
-        conn.close()
+        self.assertTrue(self.table_exists('cvs'),
+                       "CVs table should be created")
     
     def test_all_required_tables_can_be_created(self):
         """Test that all required tables can be created."""
-        conn = sqlite3.connect(self.test_db)
-        cursor = conn.cursor()
-        
-        # Create all tables
-        tables_sql = [
-            '''CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL,
-                name TEXT
-            )''',
-            '''CREATE TABLE IF NOT EXISTS profiles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                skills TEXT
-            )''',
-            '''CREATE TABLE IF NOT EXISTS internships (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                company_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                required_skills TEXT
-            )''',
-            '''CREATE TABLE IF NOT EXISTS applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id INTEGER NOT NULL,
-                internship_id INTEGER NOT NULL
-            )''',
-            '''CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sender_id INTEGER NOT NULL,
-                receiver_id INTEGER NOT NULL,
-                internship_id INTEGER NOT NULL
-            )''',
-            '''CREATE TABLE IF NOT EXISTS cvs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                full_name TEXT NOT NULL
-            )'''
-        ]
-        
-        for sql in tables_sql:
-            cursor.execute(sql)
-        
-        conn.commit()
-        
-        # Verify all tables exist
-        cursor.execute('''
+        # Only look up the expected names, not every table in the database
+        names = sorted(EXPECTED_TABLES)
+        placeholders = ','.join('?' * len(names))
+        self.cursor.execute(f'''
             SELECT name FROM sqlite_master 
-            WHERE type='table'
-        ''')
-        tables = [row[0] for row in cursor.fetchall()]
+            WHERE type='table' AND name IN ({placeholders})
+        ''', names)
+        tables = {row[0] for row in self.cursor.fetchall()}
         
-        expected_tables = ['users', 'profiles', 'internships', 
-                        'applications', 'messages', 'cvs']
+        missing = EXPECTED_TABLES - tables
+        self.assertFalse(missing,
+                        f"Tables should be created: {sorted(missing)}")
+
+
+class TestTimestampConverter(unittest.TestCase):
+    """Test the [timestamp] column converter used by app connections."""
+    
+    def setUp(self):
+        """Open an app-configured in-memory connection."""
+        self.conn = _connect(':memory:')
+    
+    def test_timestamp_column_is_parsed(self):
+        """Test that a column aliased [timestamp] comes back as a datetime."""
+        row = self.conn.execute(
+            'SELECT \'2024-05-06 07:08:09\' as "updated_at [timestamp]"').fetchone()
         
-        for table in expected_tables:
-            self.assertIn(table, tables,
-                        f"Table {table} should be created")
+        self.assertEqual(row['updated_at'], datetime(2024, 5, 6, 7, 8, 9),
+                       "Should parse CURRENT_TIMESTAMP format")
+    
+    def test_malformed_timestamp_becomes_none(self):
+        """Test that an unparseable value becomes None instead of raising."""
+        row = self.conn.execute(
+            'SELECT \'not a date\' as "updated_at [timestamp]"').fetchone()
         
-        conn.close()
+        self.assertIsNone(row['updated_at'])
+    
+    def tearDown(self):
+        """Close the connection."""
+        self.conn.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,387 @@
+"""
+Test suite for offline evaluation metrics.
+Tests Precision@K, Recall@K, MAP and NDCG on small hand-checked rankings,
+and batch content-based scoring.
+"""
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from utils import recommendations
+from utils.recommendations import content_based_recommendations
+from offline_evaluation import (
+    calculate_precision_at_k,
+    calculate_recall_at_k,
+    calculate_average_precision,
+    calculate_map,
+    calculate_dcg,
+    calculate_ndcg,
+    _metrics_at_k,
+    MAP_PARALLEL_MIN_USERS,
+    COLLAB_PARALLEL_MIN_USERS,
+    get_ground_truth,
+    evaluate_collaborative_filtering,
+    evaluate_hybrid,
+    collaborative_filtering_for_evaluation,
+    batch_content_based_recommendations,
+    connect_readonly,
+    parse_args,
+    CLI_DEFAULTS,
+    to_json
+)
+import offline_evaluation
+
+
+class TestPrecisionRecall(unittest.TestCase):
+    """Test Precision@K and Recall@K."""
+
+    def test_precision_counts_hits_in_top_k(self):
+        """Test that precision is hits in the top K divided by K."""
+        result = calculate_precision_at_k([1, 2, 3, 4], [2, 4, 9], 2)
+        self.assertEqual(result, 0.5,
+                       "One hit in the top 2 should give 0.5")
+
+    def test_recall_divides_by_relevant_count(self):
+        """Test that recall is hits in the top K divided by |relevant|."""
+        result = calculate_recall_at_k([1, 2, 3, 4], [2, 4, 9, 10], 4)
+        self.assertEqual(result, 0.5,
+                       "Two of four relevant items found should give 0.5")
+
+    def test_set_and_list_ground_truth_agree(self):
+        """Test that passing a prebuilt set gives the same scores as a list."""
+        recommended = [5, 3, 8, 1]
+        relevant = [3, 1, 7]
+
+        for k in (1, 2, 4):
+            self.assertEqual(calculate_precision_at_k(recommended, relevant, k),
+                           calculate_precision_at_k(recommended, set(relevant), k))
+            self.assertEqual(calculate_recall_at_k(recommended, relevant, k),
+                           calculate_recall_at_k(recommended, frozenset(relevant), k))
+
+    def test_repeated_recommendation_counts_once(self):
+        """Test that a relevant item recommended twice is one hit."""
+        recommended = [2, 2, 5, 4]
+        relevant = [2, 4]
+
+        self.assertEqual(calculate_precision_at_k(recommended, relevant, 2), 0.5)
+        self.assertEqual(calculate_recall_at_k(recommended, relevant, 2), 0.5)
+        self.assertEqual(calculate_recall_at_k(recommended, relevant, 4), 1.0)
+        metrics = _metrics_at_k(recommended, frozenset(relevant), [2, 4])
+        self.assertEqual(metrics[2][:2], (0.5, 0.5))
+        self.assertEqual(metrics[4][:2], (0.5, 1.0))
+
+    def test_zero_k_and_empty_relevant(self):
+        """Test edge cases return 0.0."""
+        self.assertEqual(calculate_precision_at_k([1, 2], [1], 0), 0.0)
+        self.assertEqual(calculate_recall_at_k([1, 2], [], 2), 0.0)
+
+
+class TestRankingMetrics(unittest.TestCase):
+    """Test AP, MAP, DCG and NDCG."""
+
+    def test_average_precision(self):
+        """Test AP on a ranking with hits at positions 1 and 3."""
+        result = calculate_average_precision([1, 2, 3], {1, 3}, 3)
+        self.assertAlmostEqual(result, (1 / 1 + 2 / 3) / 2)
+
+    def test_map_averages_users_with_ground_truth(self):
+        """Test that MAP averages AP over users that have relevant items."""
+        recommendations = {1: [1, 2], 2: [3, 4], 3: [5]}
+        ground_truth = {1: [1], 2: [4], 3: []}
+
+        result = calculate_map(recommendations, ground_truth, k_values=[2])
+        self.assertAlmostEqual(result[2], (1.0 + 0.5) / 2)
+
+    def test_parallel_map_matches_serial(self):
+        """Test that sharding users across processes gives the same MAP."""
+        recommendations = {uid: [uid % 7, uid % 11, uid % 13, uid % 5]
+                           for uid in range(MAP_PARALLEL_MIN_USERS)}
+        ground_truth = {uid: [uid % 11, 3] for uid in range(0, MAP_PARALLEL_MIN_USERS, 2)}
+
+        serial = calculate_map(recommendations, ground_truth, k_values=[1, 3, 5])
+        parallel = calculate_map(recommendations, ground_truth, k_values=[1, 3, 5], workers=3)
+        self.assertEqual(serial, parallel)
+
+    def test_dcg_uses_log_discount(self):
+        """Test DCG with hits at positions 1 and 3."""
+        result = calculate_dcg([1, 2, 3], {1, 3}, 3)
+        self.assertAlmostEqual(result, 1.0 + 1.0 / math.log2(4))
+
+    def test_ndcg_perfect_ranking_is_one(self):
+        """Test that ranking every relevant item first gives NDCG 1.0."""
+        result = calculate_ndcg([2, 1, 9], [1, 2], 3)
+        self.assertAlmostEqual(result, 1.0)
+
+    def test_ndcg_penalizes_late_hits(self):
+        """Test NDCG for a single relevant item ranked second."""
+        result = calculate_ndcg([9, 1], [1], 2)
+        self.assertAlmostEqual(result, 1.0 / math.log2(3))
+
+    def test_graded_ndcg_uses_exponential_gain(self):
+        """Test NDCG with graded relevance against the (2^rel - 1) formula."""
+        relevance = {1: 3, 2: 1}
+        dcg = (2 ** 1 - 1) + (2 ** 3 - 1) / math.log2(3)
+        idcg = (2 ** 3 - 1) + (2 ** 1 - 1) / math.log2(3)
+
+        result = calculate_ndcg([2, 1], relevance, 2)
+        self.assertAlmostEqual(result, dcg / idcg)
+        self.assertAlmostEqual(calculate_ndcg([1, 2], relevance, 2), 1.0,
+                             "Highest grade first should be ideal")
+
+    def test_binary_grades_match_list_ground_truth(self):
+        """Test that grades of 1 give the same NDCG as a plain list."""
+        recommended = [4, 1, 7, 2]
+        self.assertAlmostEqual(calculate_ndcg(recommended, {1: 1, 2: 1, 3: 1}, 3),
+                             calculate_ndcg(recommended, [1, 2, 3], 3))
+
+    def test_metrics_at_k_match_per_k_functions(self):
+        """Test that the one-pass metrics equal precision, recall and NDCG per K."""
+        recommended = [4, 1, 7, 2, 9]
+        relevant = frozenset([1, 2, 3])
+        k_values = [0, 1, 3, 5, 8]
+
+        metrics = _metrics_at_k(recommended, relevant, k_values)
+        for k in k_values:
+            precision, recall, ndcg = metrics[k]
+            self.assertEqual(precision, calculate_precision_at_k(recommended, relevant, k))
+            self.assertEqual(recall, calculate_recall_at_k(recommended, relevant, k))
+            self.assertAlmostEqual(ndcg, calculate_ndcg(recommended, relevant, k))
+
+        self.assertEqual(_metrics_at_k([], relevant, [5]), {5: (0.0, 0.0, 0.0)})
+
+
+class TestBatchContentBased(unittest.TestCase):
+    """Test batch content-based scoring used by the evaluation."""
+
+    def setUp(self):
+        """Set up a small database with students, a company and internships."""
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript('''
+            CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);
+            CREATE TABLE profiles (id INTEGER PRIMARY KEY, user_id INTEGER, skills TEXT);
+            CREATE TABLE internships (id INTEGER PRIMARY KEY, company_id INTEGER, title TEXT,
+                                      description TEXT, required_skills TEXT, posted_at TEXT);
+            INSERT INTO users VALUES (1, 'Student A'), (2, 'Student B'), (3, 'Acme');
+            INSERT INTO profiles (user_id, skills) VALUES (1, 'Python, SQL, Flask'), (2, 'Java');
+            INSERT INTO internships VALUES
+                (1, 3, 'Web', 'd', 'Python, Flask', 't'),
+                (2, 3, 'Data', 'd', 'SQL, Python, Pandas', 't'),
+                (3, 99, 'Orphan', 'd', 'Java, Spring', 't'),
+                (4, 3, 'Empty', 'd', '', 't');
+        ''')
+
+    def test_matches_per_user_recommendations(self):
+        """Test that batch results equal content_based_recommendations per user."""
+        user_ids = [1, 2, 5]
+        batch = batch_content_based_recommendations(self.conn, user_ids)
+
+        for user_id in user_ids:
+            self.assertEqual(batch[user_id],
+                           content_based_recommendations(user_id, self.conn.cursor()),
+                           f"Batch results should match for user {user_id}")
+        self.assertEqual(batch[2][0]['company_name'], 'Unknown Company')
+
+    def tearDown(self):
+        """Close the test database."""
+        self.conn.close()
+
+
+class TestCollaborativeEvaluation(unittest.TestCase):
+    """Test the collaborative filtering evaluation."""
+
+    def setUp(self):
+        """Set up enough students with overlapping applications to go parallel."""
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript('''
+            CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);
+            CREATE TABLE internships (id INTEGER PRIMARY KEY, company_id INTEGER, title TEXT,
+                                      description TEXT, required_skills TEXT, posted_at TEXT);
+            CREATE TABLE applications (id INTEGER PRIMARY KEY, student_id INTEGER, internship_id INTEGER);
+            INSERT INTO users (id, name) VALUES (1, 'Acme');
+        ''')
+        self.conn.executemany("INSERT INTO internships VALUES (?, 1, 't', 'd', 's', 'p')",
+                              [(i,) for i in range(1, 60)])
+        self.conn.executemany("INSERT INTO applications (student_id, internship_id) VALUES (?, ?)",
+                              [(uid, (uid * step) % 59 + 1)
+                               for uid in range(2, COLLAB_PARALLEL_MIN_USERS + 100)
+                               for step in (1, 3, 7)])
+
+    def test_parallel_matches_serial(self):
+        """Test that computing recommendations in worker processes gives the same scores."""
+        ground_truth = get_ground_truth(self.conn)
+        user_ids = list(ground_truth)
+
+        serial = evaluate_collaborative_filtering(self.conn, user_ids, ground_truth)
+        parallel = evaluate_collaborative_filtering(self.conn, user_ids, ground_truth, workers=2)
+        self.assertEqual(serial, parallel)
+        self.assertGreater(serial['precision'][5], 0.0)
+
+    def test_ids_only_matches_full_recommendations(self):
+        """Test that ids_only returns the IDs of the full recommendation dicts."""
+        cursor = self.conn.cursor()
+        for user_id in (2, 30, 500):
+            recs = collaborative_filtering_for_evaluation(user_id, cursor, {user_id % 59 + 1})
+            ids = collaborative_filtering_for_evaluation(user_id, cursor, {user_id % 59 + 1}, ids_only=True)
+            self.assertEqual(ids, [rec['id'] for rec in recs])
+            self.assertTrue(ids, f"User {user_id} should get recommendations")
+
+    def test_company_without_name_is_not_unknown(self):
+        """Test that company names match the app's queries, NULL names included."""
+        self.conn.execute("UPDATE users SET name=NULL WHERE id=1")
+        recs = collaborative_filtering_for_evaluation(2, self.conn.cursor(), {3})
+
+        self.assertTrue(recs)
+        self.assertIsNone(recs[0]['company_name'],
+                         "A company without a name is not an unknown company")
+
+    def tearDown(self):
+        """Close the test database."""
+        self.conn.close()
+
+
+class TestCollaborativeEvaluationRegression(unittest.TestCase):
+    """Pin the collaborative filtering evaluation on a fixed database."""
+
+    def setUp(self):
+        """Set up 40 students with 3-8 random applications each to 60 internships."""
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript('''
+            CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);
+            CREATE TABLE internships (id INTEGER PRIMARY KEY, company_id INTEGER, title TEXT,
+                                      description TEXT, required_skills TEXT, posted_at TEXT);
+            CREATE TABLE applications (id INTEGER PRIMARY KEY, student_id INTEGER, internship_id INTEGER);
+            INSERT INTO users (id, name) VALUES (1, 'Acme');
+        ''')
+        self.conn.executemany("INSERT INTO internships VALUES (?, 1, 't', 'd', 's', 'p')",
+                              [(i,) for i in range(1, 61)])
+        rng = random.Random(1)
+        self.conn.executemany("INSERT INTO applications (student_id, internship_id) VALUES (?, ?)",
+                              [(uid, iid)
+                               for uid in range(2, 42)
+                               for iid in rng.sample(range(1, 61), rng.randint(3, 8))])
+
+    def test_scores_match_original_implementation(self):
+        """Test that the scores equal those of the original per-user implementation."""
+        ground_truth = get_ground_truth(self.conn)
+        results = evaluate_collaborative_filtering(self.conn, list(ground_truth), ground_truth)
+
+        expected = {
+            'precision': {5: 0.02, 10: 0.0225, 20: 0.01375},
+            'recall': {5: 0.1, 10: 0.225, 20: 0.275},
+            'ndcg': {5: 0.07827324383928644, 10: 0.11707044876706159, 20: 0.1310175960496181},
+            'map': {5: 0.07083333333333333, 10: 0.08586309523809524, 20: 0.09040854978354979},
+        }
+        for metric, scores in expected.items():
+            for k, score in scores.items():
+                self.assertAlmostEqual(results[metric][k], score,
+                                     msg=f"{metric}@{k} should match the original implementation")
+
+    def tearDown(self):
+        """Close the test database."""
+        self.conn.close()
+
+
+class TestHybridEvaluation(unittest.TestCase):
+    """Test the hybrid evaluation."""
+
+    def setUp(self):
+        """Set up students with skills and overlapping applications."""
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript('''
+            CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);
+            CREATE TABLE profiles (id INTEGER PRIMARY KEY, user_id INTEGER, skills TEXT);
+            CREATE TABLE internships (id INTEGER PRIMARY KEY, company_id INTEGER, title TEXT,
+                                      description TEXT, required_skills TEXT, posted_at TEXT);
+            CREATE TABLE applications (id INTEGER PRIMARY KEY, student_id INTEGER, internship_id INTEGER);
+            INSERT INTO users VALUES (1, 'Student A'), (2, 'Student B'), (3, 'Student C'), (4, 'Acme');
+            INSERT INTO profiles (user_id, skills) VALUES (1, 'Python, SQL'), (2, 'Java'), (3, 'Python');
+            INSERT INTO internships VALUES
+                (1, 4, 'Web', 'd', 'Python', 't'),
+                (2, 4, 'Data', 'd', 'SQL, Python', 't'),
+                (3, 4, 'Backend', 'd', 'Java', 't');
+            INSERT INTO applications (student_id, internship_id) VALUES
+                (1, 1), (1, 2), (2, 1), (2, 3), (3, 1), (3, 2);
+        ''')
+
+    def test_applications_loaded_once(self):
+        """Test that every user's collaborative filtering shares one load of the applications."""
+        ground_truth = get_ground_truth(self.conn)
+        with mock.patch('utils.recommendations.load_application_state',
+                        wraps=recommendations.load_application_state) as load:
+            results = evaluate_hybrid(self.conn, list(ground_truth), ground_truth)
+
+        self.assertEqual(load.call_count, 1)
+        self.assertGreater(results['precision'][5], 0.0)
+
+    def tearDown(self):
+        """Close the test database."""
+        self.conn.close()
+
+
+class TestConnectReadonly(unittest.TestCase):
+    """Test the read-only evaluation connection."""
+
+    def setUp(self):
+        """Create a database file with one table."""
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+            conn.execute("INSERT INTO users VALUES (1, 'Student A')")
+        conn.close()
+
+    def test_reads_rows_and_rejects_writes(self):
+        """Test that rows are readable by name and writes fail."""
+        conn = connect_readonly(self.db_path)
+        try:
+            self.assertEqual(conn.execute("SELECT name FROM users").fetchone()['name'], 'Student A')
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO users VALUES (2, 'Student B')")
+        finally:
+            conn.close()
+
+    def tearDown(self):
+        """Remove the database file."""
+        os.remove(self.db_path)
+
+
+class TestJsonOutput(unittest.TestCase):
+    """Test JSON serialization of evaluation results."""
+
+    def test_stdlib_fallback_matches_default_encoder(self):
+        """Test that indented and compact output match with and without orjson."""
+        data = {'precision': {5: 0.5, 10: 0.25}, 'users': [1, 2]}
+        encoded = (to_json(data), to_json(data, indent=False))
+
+        orjson_module = offline_evaluation.orjson
+        offline_evaluation.orjson = None
+        try:
+            self.assertEqual((to_json(data), to_json(data, indent=False)), encoded)
+        finally:
+            offline_evaluation.orjson = orjson_module
+        self.assertEqual(encoded[1], '{"precision":{"5":0.5,"10":0.25},"users":[1,2]}')
+
+
+class TestCommandLine(unittest.TestCase):
+    """Test command-line parsing."""
+
+    def test_no_arguments_match_fast_path_defaults(self):
+        """Test that the parser's defaults equal the no-argument defaults."""
+        self.assertEqual(vars(parse_args([])), CLI_DEFAULTS)
+
+    def test_arguments_override_defaults(self):
+        """Test that given options replace their defaults."""
+        args = parse_args(['--k', '3', '--ab-test', '--workers', '2'])
+        self.assertEqual((args.k, args.ab_test, args.workers), ([3], True, 2))
+        self.assertEqual(args.db, CLI_DEFAULTS['db'])
+
+
+if __name__ == '__main__':
+    unittest.main()
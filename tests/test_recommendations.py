@@ -2,15 +2,36 @@
 Test suite for recommendation algorithms.
 Tests Jaccard similarity, content-based filtering, collaborative filtering, and hybrid recommendations.
 """
+import os
+import tempfile
 import unittest
 import sqlite3
+from unittest import mock
+from flask import Flask
+from utils import database
+from utils.database import init_db, get_db
 from utils.recommendations import (
     content_based_recommendations,
     collaborative_filtering,
-    get_recommendations
+    get_recommendations,
+    invalidate_recommendations,
+    get_internship_skills,
+    load_internship_skills,
+    get_application_state,
+    load_application_state,
+    record_application,
+    _recommendation_cache
 )
 
 
+def copy_database(template):
+    """Copy a template database into a fresh in-memory connection."""
+    conn = sqlite3.connect(':memory:')
+    template.backup(conn)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
 def calculate_jaccard_similarity(set1, set2):
     """Helper function to calculate Jaccard similarity."""
     intersection = len(set1 & set2)
@@ -72,14 +93,14 @@ class TestJaccardSimilarity(unittest.TestCase):
 class TestContentBasedRecommendations(unittest.TestCase):
     """Test content-based recommendation algorithm."""
     
-    def setUp(self):
-        """Set up test database with sample data."""
-        self.conn = sqlite3.connect(':memory:')
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+    @classmethod
+    def setUpClass(cls):
+        """Build the test database once with sample data."""
+        template = cls.template = sqlite3.connect(':memory:')
+        cursor = template.cursor()
         
         # Create test tables
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE users (
                 id INTEGER PRIMARY KEY,
                 email TEXT,
@@ -88,7 +109,7 @@ class TestContentBasedRecommendations(unittest.TestCase):
             )
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE profiles (
                 id INTEGER PRIMARY KEY,
                 user_id INTEGER,
@@ -98,7 +119,7 @@ class TestContentBasedRecommendations(unittest.TestCase):
             )
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE internships (
                 id INTEGER PRIMARY KEY,
                 company_id INTEGER,
@@ -111,24 +132,24 @@ class TestContentBasedRecommendations(unittest.TestCase):
         
         # Insert test data
         # Create company user
-        self.cursor.execute('''
+        cursor.execute('''
             INSERT INTO users (id, email, name, role)
             VALUES (2, 'company@test.com', 'Test Company', 'company')
         ''')
         
         # Create student user with skills
-        self.cursor.execute('''
+        cursor.execute('''
             INSERT INTO users (id, email, name, role)
             VALUES (1, 'student@test.com', 'Test Student', 'student')
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             INSERT INTO profiles (user_id, skills)
             VALUES (1, 'Python, JavaScript, React, SQL')
         ''')
         
         # Create internships
-        self.cursor.execute('''
+        cursor.execute('''
             INSERT INTO internships (id, company_id, title, description, required_skills, posted_at)
             VALUES 
             (1, 2, 'Python Developer', 'Develop Python applications', 'Python, Flask, Django', '2024-01-01'),
@@ -138,7 +159,24 @@ class TestContentBasedRecommendations(unittest.TestCase):
             (5, 2, 'Data Scientist', 'Data analysis role', 'Python, Machine Learning, Pandas', '2024-01-05')
         ''')
         
-        self.conn.commit()
+        template.commit()
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Close the template database."""
+        cls.template.close()
+    
+    def setUp(self):
+        """Give each test its own copy of the template database."""
+        self.conn = copy_database(self.template)
+        self.cursor = self.conn.cursor()
+    
+    def test_preloaded_internships_give_same_results(self):
+        """Test that passing load_internship_skills output matches loading per call."""
+        internship_skills = load_internship_skills(self.cursor)
+        
+        self.assertEqual(content_based_recommendations(1, self.cursor, internship_skills),
+                       content_based_recommendations(1, self.cursor))
     
     def test_finds_matching_internships(self):
         """Test that content-based filtering finds matching internships."""
@@ -248,14 +286,14 @@ class TestContentBasedRecommendations(unittest.TestCase):
 class TestCollaborativeFiltering(unittest.TestCase):
     """Test collaborative filtering recommendation algorithm."""
     
-    def setUp(self):
-        """Set up test database with application history."""
-        self.conn = sqlite3.connect(':memory:')
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+    @classmethod
+    def setUpClass(cls):
+        """Build the test database once with application history."""
+        template = cls.template = sqlite3.connect(':memory:')
+        cursor = template.cursor()
         
         # Create tables
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE users (
                 id INTEGER PRIMARY KEY,
                 email TEXT,
@@ -264,7 +302,7 @@ class TestCollaborativeFiltering(unittest.TestCase):
             )
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE internships (
                 id INTEGER PRIMARY KEY,
                 company_id INTEGER,
@@ -275,7 +313,7 @@ class TestCollaborativeFiltering(unittest.TestCase):
             )
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE applications (
                 id INTEGER PRIMARY KEY,
                 student_id INTEGER,
@@ -287,20 +325,20 @@ class TestCollaborativeFiltering(unittest.TestCase):
         
         # Create users
         for i in range(1, 6):
-            self.cursor.execute('''
+            cursor.execute('''
                 INSERT INTO users (id, email, name, role)
                 VALUES (?, ?, ?, 'student')
             ''', (i, f'student{i}@test.com', f'Student {i}'))
         
         # Create company
-        self.cursor.execute('''
+        cursor.execute('''
             INSERT INTO users (id, email, name, role)
             VALUES (10, 'company@test.com', 'Company', 'company')
         ''')
         
         # Create internships
         for i in range(1, 6):
-            self.cursor.execute('''
+            cursor.execute('''
                 INSERT INTO internships (id, company_id, title, description, required_skills, posted_at)
                 VALUES (?, 10, ?, 'Description', 'Python', '2024-01-01')
             ''', (i, f'Internship {i}'))
@@ -308,26 +346,36 @@ class TestCollaborativeFiltering(unittest.TestCase):
         # Create application history
         # Student 1 applied to internships 1, 2, 3
         for i in [1, 2, 3]:
-            self.cursor.execute('''
+            cursor.execute('''
                 INSERT INTO applications (student_id, internship_id, status)
                 VALUES (1, ?, 'pending')
             ''', (i,))
         
         # Student 2 applied to internships 2, 3, 4 (similar to student 1)
         for i in [2, 3, 4]:
-            self.cursor.execute('''
+            cursor.execute('''
                 INSERT INTO applications (student_id, internship_id, status)
                 VALUES (2, ?, 'pending')
             ''', (i,))
         
         # Student 3 applied to internships 4, 5 (different)
         for i in [4, 5]:
-            self.cursor.execute('''
+            cursor.execute('''
                 INSERT INTO applications (student_id, internship_id, status)
                 VALUES (3, ?, 'pending')
             ''', (i,))
         
-        self.conn.commit()
+        template.commit()
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Close the template database."""
+        cls.template.close()
+    
+    def setUp(self):
+        """Give each test its own copy of the template database."""
+        self.conn = copy_database(self.template)
+        self.cursor = self.conn.cursor()
     
     def test_finds_similar_students(self):
         """Test that collaborative filtering finds similar students."""
@@ -376,14 +424,14 @@ class TestCollaborativeFiltering(unittest.TestCase):
 class TestHybridRecommendations(unittest.TestCase):
     """Test hybrid recommendation system combining multiple algorithms."""
     
-    def setUp(self):
-        """Set up test database for hybrid recommendations."""
-        self.conn = sqlite3.connect(':memory:')
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+    @classmethod
+    def setUpClass(cls):
+        """Build the test database once for hybrid recommendations."""
+        template = cls.template = sqlite3.connect(':memory:')
+        cursor = template.cursor()
         
         # Create tables
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE users (
                 id INTEGER PRIMARY KEY,
                 email TEXT,
@@ -392,7 +440,7 @@ class TestHybridRecommendations(unittest.TestCase):
             )
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE profiles (
                 id INTEGER PRIMARY KEY,
                 user_id INTEGER,
@@ -400,7 +448,7 @@ class TestHybridRecommendations(unittest.TestCase):
             )
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE internships (
                 id INTEGER PRIMARY KEY,
                 company_id INTEGER,
@@ -411,7 +459,7 @@ class TestHybridRecommendations(unittest.TestCase):
             )
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE applications (
                 id INTEGER PRIMARY KEY,
                 student_id INTEGER,
@@ -421,26 +469,36 @@ class TestHybridRecommendations(unittest.TestCase):
         ''')
         
         # Setup data
-        self.cursor.execute('''
+        cursor.execute('''
             INSERT INTO users (id, email, name, role)
             VALUES 
             (1, 'student@test.com', 'Student', 'student'),
             (2, 'company@test.com', 'Company', 'company')
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             INSERT INTO profiles (user_id, skills)
             VALUES (1, 'Python, JavaScript')
         ''')
         
-        self.cursor.execute('''
+        cursor.execute('''
             INSERT INTO internships (id, company_id, title, required_skills, posted_at)
             VALUES 
             (1, 2, 'Python Dev', 'Python', '2024-01-01'),
             (2, 2, 'Web Dev', 'JavaScript', '2024-01-02')
         ''')
         
-        self.conn.commit()
+        template.commit()
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Close the template database."""
+        cls.template.close()
+    
+    def setUp(self):
+        """Give each test its own copy of the template database."""
+        self.conn = copy_database(self.template)
+        self.cursor = self.conn.cursor()
     
     def test_combines_recommendations(self):
         """Test that hybrid system combines recommendations from multiple algorithms."""
@@ -468,5 +526,158 @@ class TestHybridRecommendations(unittest.TestCase):
         self.conn.close()
 
 
+class TestRecommendationCache(unittest.TestCase):
+    """Test memoization and precomputed storage of get_recommendations."""
+    
+    def setUp(self):
+        """Set up a database with one internship and a stubbed pipeline."""
+        handle, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        app = Flask(__name__)
+        app.config['DATABASE'] = self.db_path
+        self.ctx = app.app_context()
+        self.ctx.push()
+        init_db()
+        conn = get_db()
+        conn.execute("INSERT INTO users (id, name, email, password, role) VALUES (10, 'Co', 'co@x', 'x', 'company')")
+        conn.execute("INSERT INTO internships (id, company_id, title, description, required_skills) VALUES (1, 10, 'Dev', 'Desc', 'python')")
+        conn.commit()
+        patcher = mock.patch('utils.recommendations.compute_recommendations',
+                             side_effect=lambda user_id: [{'id': 1, 'similarity': 0.5, 'type': 'Content-based'}])
+        self.compute = patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_repeated_calls_are_cached(self):
+        """Test that a second call for the same user skips the computation."""
+        first = get_recommendations(1)
+        second = get_recommendations(1)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(self.compute.call_count, 1,
+                        "Second call should be served from the cache")
+    
+    def test_invalidate_user_recomputes_only_that_user(self):
+        """Test that invalidating one user leaves other users cached."""
+        get_recommendations(1)
+        get_recommendations(2)
+        invalidate_recommendations(1)
+        get_recommendations(1)
+        get_recommendations(2)
+        
+        self.assertEqual(self.compute.call_count, 3,
+                        "Only the invalidated user should be recomputed")
+    
+    def test_stored_recommendations_survive_memory_cache(self):
+        """Test that precomputed rows are read back with internship details."""
+        get_recommendations(1)
+        _recommendation_cache.clear()
+        recommendations = get_recommendations(1)
+        
+        self.assertEqual(self.compute.call_count, 1,
+                        "Stored rows should be used instead of recomputing")
+        self.assertEqual(recommendations[0]['title'], 'Dev')
+        self.assertEqual(recommendations[0]['company_name'], 'Co')
+        self.assertEqual(recommendations[0]['similarity'], 0.5)
+    
+    def test_stored_company_name_matches_computed(self):
+        """Test that stored rows name companies exactly as the live queries do."""
+        get_db().execute("UPDATE users SET name=NULL WHERE id=10")
+        get_db().commit()
+        get_recommendations(1)
+        _recommendation_cache.clear()
+        
+        self.assertIsNone(get_recommendations(1)[0]['company_name'],
+                         "A company without a name is not an unknown company")
+    
+    def test_record_application_drops_students_sharing_an_application(self):
+        """Test that a new application drops stored results of students it can affect."""
+        conn = get_db()
+        conn.execute("INSERT INTO internships (id, company_id, title, description, required_skills) VALUES (2, 10, 'Data', 'Desc', 'sql')")
+        conn.executemany("INSERT INTO applications (student_id, internship_id) VALUES (?, ?)",
+                         [(1, 1), (2, 1), (3, 2)])
+        conn.commit()
+        for user_id in (2, 3):
+            get_recommendations(user_id)
+        
+        record_application(1, 1)
+        for user_id in (2, 3):
+            get_recommendations(user_id)
+        
+        self.assertEqual([call.args[0] for call in self.compute.call_args_list], [2, 3, 2],
+                        "Only the student sharing an application should be recomputed")
+    
+    def test_internship_skills_shared_until_invalidated(self):
+        """Test that parsed internship skills are reused until a global invalidation."""
+        irs = get_db().cursor()
+        first = get_internship_skills(irs)
+        self.assertIs(get_internship_skills(irs), first)
+        self.assertEqual(first[1:], ([1], [1], {'python': 1}, {'python': 1}))
+        
+        get_db().execute("INSERT INTO internships (id, company_id, title, description, required_skills) VALUES (2, 10, 'Data', 'Desc', 'SQL, Pandas')")
+        get_db().commit()
+        invalidate_recommendations()
+        
+        self.assertEqual(get_internship_skills(irs), load_internship_skills(irs))
+        self.assertEqual(len(get_internship_skills(irs)[0]), 2,
+                        "Invalidation should pick up the new internship")
+    
+    def test_application_state_updated_by_record_application(self):
+        """Test that applications are shared across calls and new ones are added in place."""
+        irs = get_db().cursor()
+        first = get_application_state(irs)
+        self.assertIs(get_application_state(irs), first)
+        
+        get_db().execute("INSERT INTO applications (student_id, internship_id) VALUES (1, 1)")
+        get_db().commit()
+        record_application(1, 1)
+        
+        self.assertIs(get_application_state(irs), first,
+                     "Recording an application should not reload the state")
+        self.assertEqual(first, load_application_state(irs),
+                        "The updated state should match a fresh load")
+    
+    def test_recorded_application_recommends_as_a_reload(self):
+        """Test that collaborative results from the updated state equal those after a reload."""
+        conn = get_db()
+        conn.executemany("INSERT INTO internships (id, company_id, title, description, required_skills) VALUES (?, 10, 'Dev', 'Desc', 'python')",
+                         [(internship_id,) for internship_id in (3, 17, 27, 32, 33, 100)])
+        # In this order, student 2's set iterates differently when grown by
+        # record_application than when loaded
+        conn.executemany("INSERT INTO applications (student_id, internship_id) VALUES (?, ?)",
+                         [(1, 100)] + [(2, internship_id) for internship_id in (100, 27, 3, 17, 33)])
+        conn.commit()
+        irs = conn.cursor()
+        get_application_state(irs)
+        
+        conn.execute("INSERT INTO applications (student_id, internship_id) VALUES (2, 32)")
+        conn.commit()
+        record_application(2, 32)
+        
+        self.assertEqual(collaborative_filtering(1, irs, get_application_state(irs)),
+                        collaborative_filtering(1, irs, load_application_state(irs)))
+    
+    def test_application_state_reloaded_by_global_invalidation(self):
+        """Test that a global invalidation picks up applications made elsewhere."""
+        irs = get_db().cursor()
+        get_application_state(irs)
+        
+        get_db().execute("INSERT INTO applications (student_id, internship_id) VALUES (1, 1)")
+        get_db().commit()
+        invalidate_recommendations()
+        
+        user_items, item_bits, user_masks = get_application_state(irs)
+        self.assertEqual(user_items, {1: {1}},
+                        "A new application should be visible after invalidation")
+        self.assertEqual(item_bits, {1: 1})
+        self.assertEqual(user_masks, {1: 1})
+    
+    def tearDown(self):
+        """Clear the caches and remove the test database."""
+        invalidate_recommendations()
+        database._local.conns.pop(os.path.abspath(self.db_path)).close()
+        self.ctx.pop()
+        os.remove(self.db_path)
+
+
 if __name__ == '__main__':
     unittest.main()
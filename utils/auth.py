@@ -1,47 +1,113 @@
 # utils/auth.py - Authentication utilities
+import os
+import secrets
+import threading
+from functools import lru_cache, wraps
+from flask import session, flash, redirect, url_for, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
-from .database import get_db
+from .database import get_db, write_transaction
+from .recommendations import invalidate_recommendations
+
+# Password hashing is deliberately slow and memory hungry (scrypt), so cap
+# how many run at once; extra requests queue instead of thrashing the CPU
+_hash_slots = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+# Werkzeug hash method for new passwords; the test suite lowers the scrypt
+# cost through this. Existing hashes verify with the method they record.
+PASSWORD_HASH_METHOD = 'scrypt'
 
 def create_sample_data():
     """Create sample data for demonstration."""
     conn = get_db()
     irs = conn.cursor()
     
+    # Collect the sample rows that are missing, then insert them in one go
+    users = []
+    profiles = []
+    internships = []
+    
     # Create admin user if not exists
-    irs.execute("SELECT * FROM users WHERE email=?", ('admin@internhub.com',))
-    admin = irs.fetchone()
-    if not admin:
-        hashed_pw = generate_password_hash('admin123')
-        irs.execute("INSERT INTO users (email, password, role, name) VALUES (?, ?, ?, ?)", 
-                       ('admin@internhub.com', hashed_pw, 'admin', 'Admin User'))
+    irs.execute("SELECT 1 FROM users WHERE email=? LIMIT 1", ('admin@internhub.com',))
+    if not irs.fetchone():
+        users.append(('admin@internhub.com', 'admin123', 'admin', 'Admin User'))
     
     # Create sample data for demonstration
-    irs.execute("SELECT * FROM users WHERE role='student'")
+    irs.execute("SELECT 1 FROM users WHERE role='student' LIMIT 1")
     if not irs.fetchone():
-        hashed_pw = generate_password_hash('student123')
-        irs.execute("INSERT INTO users (email, password, role, name) VALUES (?, ?, ?, ?)", 
-                       ('student@example.com', hashed_pw, 'student', 'John Doe'))
-        student_id = irs.lastrowid
-        irs.execute("INSERT INTO profiles (user_id, skills, education, experience) VALUES (?, ?, ?, ?)",
-                       (student_id, 'Python, Flask, SQL', 'Computer Science BSc', 'Part-time web developer'))
+        users.append(('student@example.com', 'student123', 'student', 'John Doe'))
+        profiles.append(('Python, Flask, SQL', 'Computer Science BSc', 'Part-time web developer',
+                         'student@example.com'))
         
-    irs.execute("SELECT * FROM users WHERE role='company'")
+    irs.execute("SELECT 1 FROM users WHERE role='company' LIMIT 1")
     if not irs.fetchone():
-        hashed_pw = generate_password_hash('company123')
-        irs.execute("INSERT INTO users (email, password, role, name) VALUES (?, ?, ?, ?)", 
-                       ('company@example.com', hashed_pw, 'company', 'TechCorp Inc'))
-        company_id = irs.lastrowid
-        irs.execute("INSERT INTO internships (company_id, title, description, required_skills) VALUES (?, ?, ?, ?)",
-                       (company_id, 'Web Development Intern', 'Develop web applications using Flask', 'Python, Flask, HTML, CSS'))
-        irs.execute("INSERT INTO internships (company_id, title, description, required_skills) VALUES (?, ?, ?, ?)",
-                       (company_id, 'Data Science Intern', 'Analyze datasets and build ML models', 'Python, Pandas, Machine Learning'))
+        users.append(('company@example.com', 'company123', 'company', 'TechCorp Inc'))
+        internships.append(('Web Development Intern', 'Develop web applications using Flask',
+                            'Python, Flask, HTML, CSS', 'company@example.com'))
+        internships.append(('Data Science Intern', 'Analyze datasets and build ML models',
+                            'Python, Pandas, Machine Learning', 'company@example.com'))
+    
+    if not users:
+        return
+    
+    # Hash before taking the write lock; hashing is the slow part
+    users = [(email, generate_password_hash(password, method=PASSWORD_HASH_METHOD), role, name)
+             for email, password, role, name in users]
     
-    conn.commit()
+    with write_transaction(conn):
+        irs.executemany("INSERT OR IGNORE INTO users (email, password, role, name) VALUES (?, ?, ?, ?)",
+                        users)
+        # Rows are linked to their owner by email, since executemany has no lastrowid
+        irs.executemany('''
+            INSERT OR IGNORE INTO profiles (user_id, skills, education, experience)
+            SELECT id, ?, ?, ? FROM users WHERE email=? AND role='student'
+        ''', profiles)
+        irs.executemany('''
+            INSERT INTO internships (company_id, title, description, required_skills)
+            SELECT id, ?, ?, ? FROM users WHERE email=? AND role='company'
+        ''', internships)
+    if internships:
+        invalidate_recommendations()
+
+@lru_cache(maxsize=1)
+def _dummy_hash():
+    """Hash of a random secret, used when there is no real hash to check."""
+    return generate_password_hash(secrets.token_hex(16), method=PASSWORD_HASH_METHOD)
 
 def hash_password(password):
     """Hash a password for storage."""
-    return generate_password_hash(password)
+    with _hash_slots:
+        return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
 
 def check_password(user_password, hashed_password):
-    """Check if provided password matches the hash."""
-    return check_password_hash(hashed_password, user_password)
+    """Check if provided password matches the hash.
+    
+    A missing hash (unknown user) is checked against a dummy hash and always
+    fails, so the response time doesn't reveal whether the account exists.
+    """
+    with _hash_slots:
+        if hashed_password is None:
+            check_password_hash(_dummy_hash(), user_password)
+            return False
+        return check_password_hash(hashed_password, user_password)
+
+_ROLE_ARTICLES = {'admin': 'an', 'company': 'a', 'student': 'a'}
+
+def require_role(role, api=False):
+    """Decorator to require a logged-in user with the given role.
+    
+    Page views redirect to the login page with a flash message; API views
+    (api=True) get a 401 JSON response instead.
+    """
+    login_message = f'Please log in as {_ROLE_ARTICLES.get(role, "a")} {role}'
+    
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if session.get('user_id') is None or session.get('role') != role:
+                if api:
+                    return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+                flash(login_message, 'danger')
+                return redirect(url_for('auth.login'))
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
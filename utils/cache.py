@@ -0,0 +1,47 @@
+# utils/cache.py - Small in-process caches
+import threading
+import time
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire after a timeout."""
+
+    def __init__(self, timeout=60, maxsize=256):
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, timeout=None):
+        """Store value under key for timeout seconds (default: self.timeout)."""
+        expires = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                # Drop the entry closest to expiry to make room
+                del self._data[min(self._data, key=lambda k: self._data[k][0])]
+            self._data[key] = (expires, value)
+
+    def delete(self, key):
+        """Remove key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+# Rendered pages for anonymous visitors. With an empty session (not logged
+# in, no pending flash messages) these pages are the same for everyone.
+anon_page_cache = TTLCache(timeout=60)
@@ -1,12 +1,39 @@
 # utils/database.py - Database utilities
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
 from flask import current_app
 
+# One long-lived connection per (thread, database file), so the prepared
+# statement cache and pragma setup survive across requests
+_local = threading.local()
+
+# Page size for newly created database files; larger pages mean fewer page
+# reads for the full-table scans behind recommendations
+PAGE_SIZE = 8192
+
+def _parse_timestamp(value):
+    """Convert a CURRENT_TIMESTAMP string to a datetime (None if malformed)."""
+    try:
+        return datetime.fromisoformat(value.decode())
+    except ValueError:
+        return None
+
+# Columns aliased as "name [timestamp]" come back as datetime objects
+sqlite3.register_converter('timestamp', _parse_timestamp)
+
 def init_db():
     """Initialize the database with all required tables and sample data."""
     with sqlite3.connect(current_app.config['DATABASE']) as conn:
         irs = conn.cursor()
         
+        # The page size can only be chosen before the first table exists
+        irs.execute("PRAGMA page_count")
+        if irs.fetchone()[0] == 0:
+            irs.execute(f"PRAGMA page_size={PAGE_SIZE}")
+        
         # Create users table
         irs.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -98,21 +125,201 @@ def init_db():
         )
         ''')
         
-        # Add new columns if they don't exist (for existing databases)
-        try:
-            irs.execute("ALTER TABLE cvs ADD COLUMN education_details TEXT")
-        except:
-            pass  # Column already exists
+        # Create precomputed recommendations table (see utils/recommendations.py)
+        irs.execute('''
+        CREATE TABLE IF NOT EXISTS recommendations_cache (
+            user_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            internship_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            type TEXT NOT NULL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, rank)
+        )
+        ''')
         
-        try:
+        # Add new columns if they don't exist (for existing databases);
+        # checking first keeps a normal start free of schema writes
+        irs.execute("PRAGMA table_info(cvs)")
+        cv_columns = {row[1] for row in irs.fetchall()}
+        if 'education_details' not in cv_columns:
+            irs.execute("ALTER TABLE cvs ADD COLUMN education_details TEXT")
+        if 'languages_details' not in cv_columns:
             irs.execute("ALTER TABLE cvs ADD COLUMN languages_details TEXT")
-        except:
-            pass  # Column already exists
-        
+
+        # Indexes for the lookup predicates used by the blueprints
+        # (users.email is already indexed by its UNIQUE constraint)
+        irs.execute("CREATE INDEX IF NOT EXISTS idx_apps_internship ON applications(internship_id)")
+        irs.execute("CREATE INDEX IF NOT EXISTS idx_msgs_internship ON messages(internship_id)")
+        irs.execute("DROP INDEX IF EXISTS idx_msgs_sender")  # superseded by idx_msgs_sender_sent
+        irs.execute("CREATE INDEX IF NOT EXISTS idx_msgs_sender_sent ON messages(sender_id, sent_at DESC)")
+        irs.execute("DROP INDEX IF EXISTS idx_msgs_receiver")  # superseded by idx_msgs_receiver_cover
+        # Covers the student dashboard's inbox query, so it never touches the table
+        irs.execute('''
+            CREATE INDEX IF NOT EXISTS idx_msgs_receiver_cover
+            ON messages(receiver_id, internship_id, sender_id, sent_at, content)
+        ''')
+        irs.execute("CREATE INDEX IF NOT EXISTS idx_internships_company ON internships(company_id)")
+        irs.execute("CREATE INDEX IF NOT EXISTS idx_cvs_user ON cvs(user_id)")
+
+        # One profile per user; the CV routes upsert on profiles(user_id).
+        # Older databases may hold duplicates, keep the first row of each.
+        irs.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='uq_profiles_user'")
+        if irs.fetchone() is None:
+            irs.execute("DELETE FROM profiles WHERE id NOT IN (SELECT MIN(id) FROM profiles GROUP BY user_id)")
+            irs.execute("DROP INDEX IF EXISTS idx_profiles_user")
+            irs.execute("CREATE UNIQUE INDEX uq_profiles_user ON profiles(user_id)")
+
+        # One application per student and internship, so apply can be a
+        # single INSERT OR IGNORE. Its student_id prefix also serves the
+        # per-student lookups that idx_apps_student used to.
+        irs.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='uq_apps_student_internship'")
+        if irs.fetchone() is None:
+            irs.execute('''
+                DELETE FROM applications WHERE id NOT IN
+                    (SELECT MIN(id) FROM applications GROUP BY student_id, internship_id)
+            ''')
+            irs.execute("DROP INDEX IF EXISTS idx_apps_student")
+            irs.execute("CREATE UNIQUE INDEX uq_apps_student_internship ON applications(student_id, internship_id)")
+
+        # Full-text index over internship title/description for search.
+        # External-content table: kept in sync by triggers, and rebuilt from
+        # the internships table the first time it is created.
+        irs.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='internships_fts'")
+        fts_exists = irs.fetchone() is not None
+        irs.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS internships_fts USING fts5(
+            title, description, content='internships', content_rowid='id'
+        )
+        ''')
+        if not fts_exists:
+            irs.execute("INSERT INTO internships_fts(internships_fts) VALUES ('rebuild')")
+
+        irs.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_internships_fts_insert
+        AFTER INSERT ON internships
+        BEGIN
+            INSERT INTO internships_fts(rowid, title, description)
+            VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''')
+
+        irs.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_internships_fts_delete
+        AFTER DELETE ON internships
+        BEGIN
+            INSERT INTO internships_fts(internships_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+        END
+        ''')
+
+        irs.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_internships_fts_update
+        AFTER UPDATE ON internships
+        BEGIN
+            INSERT INTO internships_fts(internships_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+            INSERT INTO internships_fts(rowid, title, description)
+            VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''')
+
+        # Cascade deletes with triggers so existing databases pick them up
+        # without rebuilding tables (FOREIGN KEY clauses can't be altered)
+        irs.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_internships_cascade_delete
+        BEFORE DELETE ON internships
+        BEGIN
+            DELETE FROM messages WHERE internship_id = OLD.id;
+            DELETE FROM applications WHERE internship_id = OLD.id;
+        END
+        ''')
+
+        irs.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_cascade_delete
+        BEFORE DELETE ON users
+        BEGIN
+            DELETE FROM profiles WHERE user_id = OLD.id;
+            DELETE FROM cvs WHERE user_id = OLD.id;
+            DELETE FROM applications WHERE student_id = OLD.id;
+            DELETE FROM messages WHERE sender_id = OLD.id OR receiver_id = OLD.id;
+            DELETE FROM internships WHERE company_id = OLD.id;
+        END
+        ''')
+
         conn.commit()
 
-def get_db():
-    """Get database connection with row factory."""
+def enable_wal():
+    """Switch the database to WAL journaling (persists in the database file)."""
     conn = sqlite3.connect(current_app.config['DATABASE'])
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.close()
+
+def analyze_db():
+    """Refresh planner statistics so SQLite picks up the indexes."""
+    with sqlite3.connect(current_app.config['DATABASE']) as conn:
+        conn.execute("ANALYZE")
+
+def _connect(path):
+    """Open a connection with row factory and per-connection pragmas."""
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256,
+                           detect_types=sqlite3.PARSE_COLNAMES)
     conn.row_factory = sqlite3.Row
+    
+    # Per-connection tuning; WAL makes synchronous=NORMAL safe
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    return conn
+
+def get_db():
+    """Get this thread's database connection (opened on first use)."""
+    path = os.path.abspath(current_app.config['DATABASE'])
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
     return conn
+
+@contextmanager
+def write_transaction(conn):
+    """Run a block of writes in one BEGIN IMMEDIATE transaction.
+    
+    Takes the write lock up front so concurrent writers wait on the busy
+    timeout instead of failing on a shared->reserved lock upgrade.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+@contextmanager
+def read_transaction(conn):
+    """Run a block of reads in one deferred transaction.
+    
+    All statements see the same snapshot and share one read lock instead
+    of taking one per statement.
+    """
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.commit()
+
+def release_db(exception=None):
+    """Roll back anything a request left uncommitted; the connection stays open."""
+    conns = getattr(_local, 'conns', None)
+    if not conns:
+        return
+    conn = conns.get(os.path.abspath(current_app.config['DATABASE']))
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
@@ -1,16 +1,120 @@
 # utils/recommendations.py - Recommendation algorithms
-from .database import get_db
+import heapq
+import threading
+from operator import itemgetter
+from flask import current_app
+from .cache import TTLCache
+from .database import get_db, read_transaction, write_transaction
+
+# Recommendations per (database, user) for a short while. The routes that
+# change a user's inputs invalidate explicitly, and record_application()
+# drops the students a new application can affect; the timeout bounds
+# staleness from activity in other processes
+_recommendation_cache = TTLCache(timeout=60, maxsize=1024)
+
+# Internship rows with their parsed skill sets, per database. Every student's
+# content-based score reads the same list; the routes that add or delete
+# internships clear it through invalidate_recommendations()
+_internship_skills_cache = TTLCache(timeout=300, maxsize=16)
+
+# Every student's applications, per database, for collaborative filtering.
+# New applications are added in place by record_application(), a global
+# invalidation clears it, and the timeout bounds staleness from other
+# processes
+_application_state_cache = TTLCache(timeout=60, maxsize=16)
+_application_state_lock = threading.Lock()
+
+# Rows in recommendations_cache older than this are recomputed on read, so
+# the table stays useful even when refresh_recommendations isn't scheduled.
+# Invalidation deletes rows for every process, but another process may have
+# stored rows computed from an application state up to its timeout old;
+# such rows are served until they reach this age
+STORED_MAX_AGE = '-60 minutes'
+
+SQL_STORED_RECOMMENDATIONS = '''
+    SELECT internships.id, internships.title, internships.description,
+           internships.required_skills, internships.posted_at,
+           CASE WHEN users.id IS NULL THEN 'Unknown Company' ELSE users.name END as company_name,
+           internships.company_id, recommendations_cache.score as similarity,
+           recommendations_cache.type
+    FROM recommendations_cache
+    JOIN internships ON recommendations_cache.internship_id = internships.id
+    LEFT JOIN users ON internships.company_id = users.id
+    WHERE recommendations_cache.user_id=? AND recommendations_cache.computed_at > datetime('now', ?)
+    ORDER BY recommendations_cache.rank
+'''
+
+# Students with at least one application in common with the given student
+SQL_STUDENTS_SHARING_APPLICATIONS = '''
+    SELECT DISTINCT others.student_id
+    FROM applications mine
+    JOIN applications others ON others.internship_id = mine.internship_id
+    WHERE mine.student_id=? AND others.student_id != ?
+'''
 
 def get_recommendations(user_id):
-    """Get personalized internship recommendations for a user."""
+    """Get personalized internship recommendations for a user (cached)."""
+    key = (current_app.config['DATABASE'], user_id)
+    recommendations = _recommendation_cache.get(key)
+    if recommendations is None:
+        recommendations = load_recommendations(user_id)
+        if not recommendations:
+            recommendations = compute_recommendations(user_id)
+            store_recommendations(user_id, recommendations)
+        _recommendation_cache.set(key, recommendations)
+    return recommendations
+
+def load_recommendations(user_id):
+    """Read a user's precomputed recommendations, in rank order."""
+    rows = get_db().execute(SQL_STORED_RECOMMENDATIONS, (user_id, STORED_MAX_AGE)).fetchall()
+    return [dict(row) for row in rows]
+
+def store_recommendations(user_id, recommendations):
+    """Replace a user's precomputed recommendations."""
+    conn = get_db()
+    with write_transaction(conn):
+        conn.execute("DELETE FROM recommendations_cache WHERE user_id=?", (user_id,))
+        conn.executemany(
+            "INSERT INTO recommendations_cache (user_id, rank, internship_id, score, type) VALUES (?, ?, ?, ?, ?)",
+            [(user_id, rank, rec['id'], rec['similarity'], rec['type'])
+             for rank, rec in enumerate(recommendations)])
+
+def refresh_recommendations():
+    """Recompute and store recommendations for every student."""
+    conn = get_db()
+    student_ids = [row['id'] for row in conn.execute("SELECT id FROM users WHERE role='student'")]
+    for user_id in student_ids:
+        store_recommendations(user_id, compute_recommendations(user_id))
+    _recommendation_cache.clear()
+    return len(student_ids)
+
+def invalidate_recommendations(user_id=None):
+    """Drop cached recommendations for one user, or for everyone."""
+    conn = get_db()
+    with write_transaction(conn):
+        if user_id is None:
+            conn.execute("DELETE FROM recommendations_cache")
+        else:
+            conn.execute("DELETE FROM recommendations_cache WHERE user_id=?", (user_id,))
+    if user_id is None:
+        _recommendation_cache.clear()
+        _internship_skills_cache.clear()
+        _application_state_cache.clear()
+    else:
+        _recommendation_cache.delete((current_app.config['DATABASE'], user_id))
+
+def compute_recommendations(user_id):
+    """Compute personalized internship recommendations for a user."""
     conn = get_db()
     irs = conn.cursor()
     
-    # Content-based recommendations
-    content_recs = content_based_recommendations(user_id, irs)
-    
-    # Collaborative filtering recommendations
-    collab_recs = collaborative_filtering(user_id, irs)
+    # Both passes read one snapshot under a single read transaction
+    with read_transaction(conn):
+        # Content-based recommendations
+        content_recs = content_based_recommendations(user_id, irs, get_internship_skills(irs))
+        
+        # Collaborative filtering recommendations
+        collab_recs = collaborative_filtering(user_id, irs, get_application_state(irs))
     
     # Combine and deduplicate recommendations
     all_recs = {rec['id']: rec for rec in content_recs}
@@ -26,8 +130,78 @@ def get_recommendations(user_id):
     
     return list(all_recs.values())
 
-def content_based_recommendations(user_id, irs):
-    """Content-based recommendation algorithm using skill matching."""
+try:
+    _popcount = int.bit_count  # Python 3.10+
+except AttributeError:
+    def _popcount(mask):
+        return bin(mask).count('1')
+
+# Internship columns copied into each recommendation, in output order
+RECOMMENDATION_FIELDS = ('id', 'title', 'description', 'required_skills',
+                         'posted_at', 'company_name', 'company_id')
+
+def to_recommendation(internship, similarity, rec_type):
+    """Build a recommendation dict from an internship row with company_name."""
+    recommendation = {field: internship[field] for field in RECOMMENDATION_FIELDS}
+    recommendation['similarity'] = similarity
+    recommendation['type'] = rec_type
+    return recommendation
+
+def parse_skills(skills):
+    """Split a comma-separated skills string into a set of lowercase skills."""
+    return frozenset(skill.strip().lower() for skill in skills.split(',')) if skills else frozenset()
+
+def load_internship_skills(irs):
+    """
+    Load every internship that lists required skills, with its company name.
+    
+    Returns (internships, skill_masks, skill_counts, skill_bits,
+    skill_internships): the internship rows, parallel lists of each one's
+    required skills as a bitmask and how many there are, the bit given to
+    each skill, and for each skill a bitmask of the positions of the
+    internships that ask for it. Scoring a student is then an AND and a
+    popcount for each internship sharing one of their skills.
+    """
+    irs.execute('''
+        SELECT internships.*,
+               CASE WHEN users.id IS NULL THEN 'Unknown Company' ELSE users.name END as company_name
+        FROM internships
+        LEFT JOIN users ON internships.company_id = users.id
+        ORDER BY internships.id
+    ''')
+    internships = []
+    skill_masks = []
+    skill_counts = []
+    skill_bits = {}
+    skill_internships = {}
+    for internship in irs.fetchall():
+        required_skills = parse_skills(internship['required_skills'])
+        if required_skills:
+            position = 1 << len(internships)
+            for skill in required_skills:
+                skill_internships[skill] = skill_internships.get(skill, 0) | position
+            internships.append(internship)
+            skill_masks.append(sum(skill_bits.setdefault(skill, 1 << len(skill_bits))
+                                   for skill in required_skills))
+            skill_counts.append(len(required_skills))
+    return internships, skill_masks, skill_counts, skill_bits, skill_internships
+
+def get_internship_skills(irs):
+    """load_internship_skills for the app database, shared across requests."""
+    key = current_app.config['DATABASE']
+    internship_skills = _internship_skills_cache.get(key)
+    if internship_skills is None:
+        internship_skills = load_internship_skills(irs)
+        _internship_skills_cache.set(key, internship_skills)
+    return internship_skills
+
+def content_based_recommendations(user_id, irs, internship_skills=None):
+    """
+    Content-based recommendation algorithm using skill matching.
+    
+    internship_skills is a load_internship_skills result to score against;
+    it is loaded through irs when omitted.
+    """
     # Get student's skills
     irs.execute("SELECT skills FROM profiles WHERE user_id=?", (user_id,))
     profile = irs.fetchone()
@@ -35,107 +209,180 @@ def content_based_recommendations(user_id, irs):
     if not profile or not profile['skills']:
         return []
     
-    student_skills = set(skill.strip().lower() for skill in profile['skills'].split(','))
+    # Get all internships with their skill masks
+    if internship_skills is None:
+        internship_skills = load_internship_skills(irs)
+    return score_internships(parse_skills(profile['skills']), internship_skills)
+
+def score_internships(student_skills, internship_skills):
+    """
+    Top 5 content-based recommendations for a set of student skills.
     
-    # Get all internships
-    irs.execute("SELECT * FROM internships")
-    internships = irs.fetchall()
+    internship_skills is a load_internship_skills result; each internship
+    is scored by the Jaccard similarity of its skills and the student's.
+    """
+    internships, skill_masks, skill_counts, skill_bits, skill_internships = internship_skills
     
-    # Calculate similarity for each internship
-    recommendations = []
-    for internship in internships:
-        required_skills = set(skill.strip().lower() for skill in internship['required_skills'].split(',')) if internship['required_skills'] else set()
-        
-        if not required_skills:
-            continue
+    # Skills no internship asks for have no bit but still count towards the union
+    student_mask = sum(skill_bits.get(skill, 0) for skill in student_skills)
+    student_count = len(student_skills)
+    
+    # Only internships sharing a skill with the student can score above 0
+    candidates = 0
+    for skill in student_skills:
+        candidates |= skill_internships.get(skill, 0)
+    
+    def matches(candidates):
+        """(internship, similarity) for each candidate, in internship order."""
+        while candidates:
+            lowest = candidates & -candidates
+            candidates ^= lowest
+            index = lowest.bit_length() - 1
             
-        # Jaccard similarity
-        intersection = len(student_skills & required_skills)
-        union = len(student_skills | required_skills)
-        similarity = intersection / union if union > 0 else 0
-        
-        if similarity > 0.2:  # Threshold
-            # Get company information
-            irs.execute("SELECT name FROM users WHERE id=?", (internship['company_id'],))
-            company = irs.fetchone()
-            company_name = company['name'] if company else 'Unknown Company'
+            # Jaccard similarity; |A ∪ B| = |A| + |B| - |A ∩ B|
+            intersection = _popcount(student_mask & skill_masks[index])
+            union = student_count + skill_counts[index] - intersection
+            similarity = intersection / union
             
-            recommendations.append({
-                'id': internship['id'],
-                'title': internship['title'],
-                'description': internship['description'],
-                'required_skills': internship['required_skills'],
-                'posted_at': internship['posted_at'],
-                'company_name': company_name,
-                'company_id': internship['company_id'],
-                'similarity': similarity,
-                'type': 'Content-based'
-            })
-    
-    # Sort by similarity
-    recommendations.sort(key=lambda x: x['similarity'], reverse=True)
-    return recommendations[:5]
-
-def collaborative_filtering(user_id, irs):
-    """Collaborative filtering recommendation algorithm."""
-    # Get applications of similar students
-    # Step 1: Find students with similar applications
-    irs.execute("SELECT student_id, internship_id FROM applications")
-    all_applications = irs.fetchall()
+            if similarity > 0.2:  # Threshold
+                yield internships[index], similarity
+    
+    # Top 5 by similarity in one pass; ties keep internship order, as a
+    # stable sort would
+    recommendations = []
+    for internship, similarity in heapq.nlargest(5, matches(candidates), key=itemgetter(1)):
+        recommendations.append(to_recommendation(internship, similarity, 'Content-based'))
+    return recommendations
+
+def load_application_state(irs):
+    """
+    Load every student's applications.
+    
+    Returns (user_items, item_bits, user_masks): each student's set of
+    applied internship IDs, the bit given to each internship, and each
+    student's applications as a bitmask of those bits, so comparing two
+    students is an AND plus a popcount.
+    Neither is modified by the recommenders.
+    """
+    # Every application is read, so stream them as plain tuples rather
+    # than building a Row per application
+    app_cursor = irs.connection.cursor()
+    app_cursor.row_factory = None
+    app_cursor.execute("SELECT student_id, internship_id FROM applications")
     
     # Build user-item matrix
     user_items = {}
-    for app in all_applications:
-        student_id = app['student_id']
-        internship_id = app['internship_id']
+    user_masks = {}
+    item_bits = {}
+    for student_id, internship_id in app_cursor:
         if student_id not in user_items:
             user_items[student_id] = set()
+            user_masks[student_id] = 0
         user_items[student_id].add(internship_id)
+        user_masks[student_id] |= item_bits.setdefault(internship_id, 1 << len(item_bits))
+    return user_items, item_bits, user_masks
+
+def get_application_state(irs):
+    """load_application_state for the app database, shared across requests."""
+    key = current_app.config['DATABASE']
+    application_state = _application_state_cache.get(key)
+    if application_state is None:
+        application_state = load_application_state(irs)
+        _application_state_cache.set(key, application_state)
+    return application_state
+
+def record_application(student_id, internship_id):
+    """
+    Add a new application to the shared application state, if it is loaded,
+    and drop the recommendations it can change.
+    
+    Readers may be iterating the state, so a student's set is replaced
+    rather than changed and a new student's mask is stored before their set.
+    The applicant's own recommendations are left to invalidate_recommendations().
+    """
+    key = current_app.config['DATABASE']
+    with _application_state_lock:
+        application_state = _application_state_cache.get(key)
+        if application_state is not None:
+            user_items, item_bits, user_masks = application_state
+            bit = item_bits.setdefault(internship_id, 1 << len(item_bits))
+            user_masks[student_id] = user_masks.get(student_id, 0) | bit
+            user_items[student_id] = user_items.get(student_id, set()) | {internship_id}
+    
+    # Only a student sharing an application with the applicant can have them
+    # among their similar students, so only their results can change
+    conn = get_db()
+    with write_transaction(conn):
+        affected = [row[0] for row in conn.execute(SQL_STUDENTS_SHARING_APPLICATIONS, (student_id, student_id))]
+        conn.executemany("DELETE FROM recommendations_cache WHERE user_id=?",
+                         [(user_id,) for user_id in affected])
+    for user_id in affected:
+        _recommendation_cache.delete((key, user_id))
+
+def collaborative_filtering(user_id, irs, application_state=None):
+    """
+    Collaborative filtering recommendation algorithm.
+    
+    application_state is a load_application_state result to use; it is
+    loaded through irs when omitted.
+    """
+    # Get applications of similar students
+    # Step 1: Find students with similar applications
+    if application_state is None:
+        application_state = load_application_state(irs)
+    user_items, _, user_masks = application_state
     
     # Find similar students based on Jaccard similarity
     current_user_apps = user_items.get(user_id, set())
-    similar_students = []
+    current_user_mask = user_masks.get(user_id, 0)
+    current_user_count = len(current_user_apps)
     
-    for student_id, apps in user_items.items():
-        if student_id == user_id:
-            continue
+    def similar_students():
+        """(student_id, similarity) for every student sharing an application."""
+        for student_id, apps in list(user_items.items()):
+            if student_id == user_id:
+                continue
             
-        intersection = len(current_user_apps & apps)
-        union = len(current_user_apps | apps)
-        similarity = intersection / union if union > 0 else 0
-        
-        if similarity > 0:
-            similar_students.append((student_id, similarity))
+            intersection = _popcount(current_user_mask & user_masks[student_id])
+            if intersection:
+                # |A ∪ B| = |A| + |B| - |A ∩ B|
+                yield student_id, intersection / (current_user_count + len(apps) - intersection)
     
-    # Sort by similarity
-    similar_students.sort(key=lambda x: x[1], reverse=True)
+    # Top 3 similar students in one pass; ties keep their original order,
+    # as a stable sort would
+    top_similar = heapq.nlargest(3, similar_students(), key=itemgetter(1))
     
-    # Get top internships from similar students
+    # Internships from the top 3 similar students, in order, each with the
+    # similarity of the first student who applied to it (excluding
+    # internships already applied to). Each student's internships are taken
+    # by ID, so the result doesn't depend on how their set was built
+    candidates = {}
+    for student_id, similarity in top_similar:
+        for internship_id in sorted(user_items[student_id]):
+            if internship_id not in current_user_apps and internship_id not in candidates:
+                candidates[internship_id] = similarity
+    
+    # Fetch only as many candidates as are still needed for the top 5, with
+    # their company names, in one query per batch
+    candidate_ids = list(candidates)
     recommendations = []
-    seen_internships = set(current_user_apps)  # Exclude internships already applied to
-    
-    for student_id, similarity in similar_students[:3]:  # Top 3 similar students
-        for internship_id in user_items[student_id]:
-            if internship_id not in seen_internships:
-                irs.execute("SELECT * FROM internships WHERE id=?", (internship_id,))
-                internship = irs.fetchone()
-                if internship:
-                    # Get company information
-                    irs.execute("SELECT name FROM users WHERE id=?", (internship['company_id'],))
-                    company = irs.fetchone()
-                    company_name = company['name'] if company else 'Unknown Company'
-                    
-                    recommendations.append({
-                        'id': internship['id'],
-                        'title': internship['title'],
-                        'description': internship['description'],
-                        'required_skills': internship['required_skills'],
-                        'posted_at': internship['posted_at'],
-                        'company_name': company_name,
-                        'company_id': internship['company_id'],
-                        'similarity': similarity,
-                        'type': 'Collaborative'
-                    })
-                    seen_internships.add(internship_id)
-    
-    return recommendations[:5]  # Top 5
+    position = 0
+    while len(recommendations) < 5 and position < len(candidate_ids):
+        batch = candidate_ids[position:position + 5 - len(recommendations)]
+        position += len(batch)
+        placeholders = ','.join('?' * len(batch))
+        irs.execute(f'''
+            SELECT internships.*,
+                   CASE WHEN users.id IS NULL THEN 'Unknown Company' ELSE users.name END as company_name
+            FROM internships
+            LEFT JOIN users ON internships.company_id = users.id
+            WHERE internships.id IN ({placeholders})
+        ''', batch)
+        internships = {internship['id']: internship for internship in irs.fetchall()}
+        
+        for internship_id in batch:
+            internship = internships.get(internship_id)
+            if internship:
+                recommendations.append(to_recommendation(internship, candidates[internship_id], 'Collaborative'))
+    
+    return recommendations